@@ -0,0 +1,342 @@
+"""
+AUTHOR:         YemotaY
+Titel:          pysu benchmarks
+Beschreibung:   measures what pysu costs on every hot path, results get printed/saved as JSON
+Lizenz:         open source of course
+
+Run: python benchmarks.py [--quick] [--only trace scanner] [--output results.json] [--compare baseline.json]
+"""
+
+# IMPORTS
+import io
+import os
+import sys
+import gc
+import json
+import time
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+import contextlib
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HEAVY_MODULES = ("numpy", "networkx", "matplotlib")
+sys.path.insert(0, HERE)
+
+
+def _measure(func, number, repeat=5):
+    """
+    Runs func() number times per round
+    Args:
+        func (callable) = the measured call
+        number (int)    = calls per round
+        repeat (int)    = rounds, the median and the best get reported
+    Returns:
+        result (dict)   = median_ns/min_ns per call
+    """
+    per_call = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            func()
+        per_call.append((time.perf_counter_ns() - start) / number)
+    return {"median_ns": statistics.median(per_call), "min_ns": min(per_call)}
+
+
+def bench_import(runs=10):
+    """
+    Imports pysu in fresh interpreters, so nothing is cached in sys.modules
+    Args:
+        runs (int)      = how many interpreters get started
+    Returns:
+        result (dict)   = median/min import time in ms and the heavy modules that got loaded
+    """
+    code = (
+        "import sys, time, json\n"
+        "t = time.perf_counter()\n"
+        "import pysu\n"
+        "ms = (time.perf_counter() - t) * 1000\n"
+        f"print(json.dumps([ms, [m for m in {HEAVY_MODULES!r} if m in sys.modules]]))\n"
+    )
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None) # measure the import, not the compile
+    times = []
+    heavy = []
+    for i in range(runs + 1):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=HERE, env=env, check=True).stdout
+        ms, heavy = json.loads(out)
+        if i: # first run only warms up the bytecode cache
+            times.append(ms)
+    return {
+        "name": "import pysu",
+        "runs": runs,
+        "median_ms": statistics.median(times),
+        "min_ms": min(times),
+        "heavy_modules_loaded": heavy,
+    }
+
+
+def bench_messages(calls=100_000):
+    """
+    Cost of info/warn/error per call on every level, filtered calls included
+    Args:
+        calls (int)     = calls per round
+    Returns:
+        results (list)  = one result per level and method
+    """
+    from pysu import pysu
+    results = []
+    for level in (0, 1, 2, 3):
+        for method in ("info", "warn", "error"):
+            with contextlib.redirect_stdout(io.StringIO()): # level 3 prints the scan, stdout is the report
+                log = pysu(level=level, linked=False, save=False, scan_cache=False)
+            call = getattr(log, method)
+            result = _measure(lambda: call("benchmark message", console=False), calls)
+            results.append({"name": f"pysu.{method}", "params": {"level": level}, **result, "stored": len(log.messages)})
+            log.close()
+    return results
+
+
+def _workloads(trace):
+    """The traced functions: tiny, loop heavy and deeply nested (every level traced), trace=None -> untraced"""
+    trace = trace or (lambda func: func)
+
+    @trace
+    def tiny(x):
+        return x + 1
+
+    @trace
+    def loop(n):
+        total = 0
+        for i in range(n):
+            total += i
+        return total
+
+    def nested(depth):
+        return 0 if depth == 0 else traced_nested(depth - 1) + 1
+    traced_nested = trace(nested)
+
+    return {
+        "tiny": (lambda: tiny(1), 20_000),
+        "loop_200": (lambda: loop(200), 300),
+        "nested_30": (lambda: traced_nested(30), 300),
+    }
+
+
+def bench_trace(engines=None):
+    """
+    Overhead of FunctionProfiler.trace per call of the outermost function
+    Args:
+        engines (list)  = trace engines, None = every engine usable on this python, "disabled" always gets added
+    Returns:
+        results (list)  = one result per engine and workload, with the untraced baseline
+    """
+    from pysu import FunctionProfiler, TRACE_ENGINES
+    engines = engines or [name for name in TRACE_ENGINES if name != "monitoring" or hasattr(sys, "monitoring")]
+    baseline = {name: _measure(call, number) for name, (call, number) in _workloads(None).items()}
+    results = []
+    for engine in engines + ["disabled"]: # disabled = decorators in place, tracing switched off
+        if engine == "disabled":
+            profiler = FunctionProfiler(False, enabled=False)
+        else:
+            profiler = FunctionProfiler(False, engine, retention={"max_entries": 10_000})
+        for name, (call, number) in _workloads(profiler.trace).items():
+            result = _measure(call, number)
+            results.append({
+                "name": f"trace.{name}",
+                "params": {"engine": engine},
+                **result,
+                "baseline_ns": baseline[name]["median_ns"],
+                "overhead_ns": result["median_ns"] - baseline[name]["median_ns"],
+                "slowdown": result["median_ns"] / baseline[name]["median_ns"],
+            })
+        profiler.close() # gives the sys.monitoring tool back
+    return results
+
+
+def _synthetic_module(path, classes, offset=0):
+    """Writes a module with `classes` classes, 3 methods each, calling methods of their neighbours"""
+    lines = []
+    for i in range(offset, offset + classes):
+        lines += [
+            f"class Class{i}:",
+            f"    def __init__(self, a, b=1):",
+            f"        self.a = a",
+            f"        self.neighbour = Class{i + 1}(a)",
+            f"    def compute(self, x, y):",
+            f"        return self.helper(x) + self.neighbour.compute(y, x)",
+            f"    def helper(self, x):",
+            f"        return self.a * x",
+            "",
+        ]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+
+
+def bench_scanner(sizes=(10, 100, 1_000, 10_000)):
+    """
+    PyClassScanner.run, pysu.combine_structs and pysu.generate_uml_diagram on synthetic code bases
+    Args:
+        sizes (tuple)   = number of classes, split over two modules that get combined
+    Returns:
+        results (list)  = one result per step and size, in ms
+    """
+    from pysu import pysu, PyClassScanner
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            base_path = os.path.join(tmp, f"base_{size}.py")
+            linked_path = os.path.join(tmp, f"linked_{size}.py")
+            _synthetic_module(base_path, size - size // 2)
+            _synthetic_module(linked_path, size // 2, offset=size - size // 2)
+            repeat = 5 if size <= 1_000 else 2
+
+            structs = {}
+            def scan():
+                structs["base"] = PyClassScanner(base_path).run()
+                structs["linked"] = PyClassScanner(linked_path).run()
+            steps = {
+                "PyClassScanner.run": scan,
+                "combine_structs": lambda: structs.__setitem__("combined", pysu.combine_structs(structs["base"], structs["linked"])),
+                "generate_uml_diagram": lambda: pysu.generate_uml_diagram(structs["combined"]),
+            }
+            for name, step in steps.items():
+                result = _measure(step, 1, repeat)
+                results.append({
+                    "name": name,
+                    "params": {"classes": size},
+                    "median_ms": result["median_ns"] / 1e6,
+                    "min_ms": result["min_ns"] / 1e6,
+                })
+    return results
+
+
+def bench_show_logs(histories=(100, 1_000, 10_000)):
+    """
+    FunctionProfiler.show_logs (sink flush + formatting, console output discarded) as the history grows
+    Args:
+        histories (tuple) = number of traced calls in the logs
+    Returns:
+        results (list)    = one result per history size, in ms
+    """
+    from pysu import FunctionProfiler
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp) # TRACE.jsonl lands in the temp dir
+        try:
+            for history in histories:
+                profiler = FunctionProfiler(True)
+
+                @profiler.trace
+                def work(x, y=2):
+                    z = x * y
+                    return z + 1
+
+                for i in range(history):
+                    work(i)
+                start = time.perf_counter_ns()
+                flush_start = start
+                profiler.sink.flush()
+                flush_ns = time.perf_counter_ns() - flush_start
+                with contextlib.redirect_stdout(io.StringIO()):
+                    profiler.show_logs()
+                total_ns = time.perf_counter_ns() - start
+                profiler.sink.close()
+                profiler.close()
+                results.append({
+                    "name": "show_logs",
+                    "params": {"history": history},
+                    "total_ms": total_ns / 1e6,
+                    "flush_ms": flush_ns / 1e6,
+                    "per_record_us": total_ns / history / 1e3,
+                })
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+BENCHMARKS = {
+    "import": lambda quick: [bench_import(3 if quick else 10)],
+    "messages": lambda quick: bench_messages(10_000 if quick else 100_000),
+    "trace": lambda quick: bench_trace(),
+    "scanner": lambda quick: bench_scanner((10, 100, 1_000) if quick else (10, 100, 1_000, 10_000)),
+    "show_logs": lambda quick: bench_show_logs((100, 1_000) if quick else (100, 1_000, 10_000)),
+}
+
+
+def _revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=HERE, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _key(result):
+    return f"{result['name']} {json.dumps(result.get('params', {}), sort_keys=True)}"
+
+
+def compare(baseline, current):
+    """
+    Compares two result files of this script
+    Args:
+        baseline (dict) = older run
+        current (dict)  = newer run
+    Returns:
+        changes (list)  = name, params and ratio new/old of every timing both runs have, > 1 means slower
+    """
+    old = {_key(result): result for result in baseline["results"]}
+    changes = []
+    for result in current["results"]:
+        before = old.get(_key(result))
+        if before is None:
+            continue
+        for metric in ("median_ns", "median_ms", "total_ms"):
+            if metric in result and before.get(metric):
+                changes.append({
+                    "name": result["name"],
+                    "params": result.get("params", {}),
+                    "metric": metric,
+                    "old": before[metric],
+                    "new": result[metric],
+                    "ratio": result[metric] / before[metric],
+                })
+    return changes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measures what pysu costs, prints the results as JSON")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes, for a fast check")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument("--output", help="also write the results into this file")
+    parser.add_argument("--compare", help="result file of an older revision, adds the new/old ratios")
+    args = parser.parse_args(argv)
+
+    report = {
+        "meta": {
+            "revision": _revision(),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "quick": args.quick,
+        },
+        "results": [],
+    }
+    with contextlib.redirect_stdout(sys.stderr): # stray prints must not break the JSON on stdout
+        for name in args.only or BENCHMARKS:
+            report["results"].extend(BENCHMARKS[name](args.quick))
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            report["comparison"] = compare(json.load(f), report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,57 +8,89 @@ Lizenz:         open source of course
 
 # IMPORTS
 import os
-import ast
 import sys
 import time
 import json
-import inspect 
-import numpy as np
-import networkx as nx
-import matplotlib.pyplot as plt
+import math
+import heapq
+import hashlib
+import struct
+import queue
+import atexit
+import threading
+import functools
+import contextvars
+import types
+import weakref
 from typing import Any
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
 from datetime import datetime
-from matplotlib.widgets import CheckButtons
 import re 
 
 
+def __getattr__(name):
+    """Lazy module attributes, the heavy visualization stack (numpy/networkx/matplotlib) only gets imported on first use"""
+    if name == "MonitorVisualizer":
+        from pysu_visual import MonitorVisualizer
+        return MonitorVisualizer
+    if name == "PysuHandler": # needs the logging package, which costs more than pysu itself to import
+        return _handler_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 class pysu:
     """
     This is an advanced class to log/monitor/visualize even big chunks of logic,"fast".
-    level       = level: 1 -> only errors,2 -> warnings, too, 3 -> Everything, 0=Nothing(No log, no trace and no profiler)\
+    level       = level: 1 -> only errors,2 -> warnings, too, 3 -> Everything, 0=Nothing(No log, tracing switched off until FunctionProfiler.enable())\
     linked      = True/False if you want to analyze any linked classes, when activated add #TOLOG to the class\
     save        = True/False, Should everythong be written into a file?\
-    visualize   = True/False To be done..
+    visualize   = True/False, renders the found classes into UML.html (with save), refer to pysu_visual.MonitorVisualizer
+    trace_engine= "auto"/"monitoring"/"settrace", backend of the FunctionProfiler, auto uses sys.monitoring on 3.12+
+    retention   = None (keep everything) or dict with the BoundedStore options max_entries, max_bytes, policy, spill\
+                  applied to the messages and the trace logs, so memory stays flat in long running processes\
+    scan_cache  = True/False or a directory, caches the PyClassScanner results on disk (default .pysu_cache next to the source)\
+    tail        = None (keep every traced call) or dict with the TailPolicy options slower_ms, top_n, window_s, errors\
+    binary_trace= False/True or a path, every traced call also lands as one compact row in TRACE.pysutrace (read it with TraceReader)
+    sinks       = None or list of ConsoleLogSink/FileLogSink/JsonlLogSink, the messages get written by a LogPipeline in the background,
+                  console output included (a ConsoleLogSink is added if missing). log.handler() hooks stdlib logging into the same pipeline
+    memory      = None, True or dict with the MemoryTracker options every, top, frames, paths: traced calls also record their peak/net allocated bytes
     refer example uses for better understanding.
 
     """
-    def __init__(self, level=1, linked = True, save = True, visualize = False) -> None:
+    def __init__(self, level=1, linked = True, save = True, visualize = False, trace_engine = "auto", retention = None, scan_cache = True, tail = None, binary_trace = False, sinks = None, memory = None) -> None:
         if 0 > level < 3:
             raise Exception(f"Ungültiges Loglevel {level}")
         
         self.level = level  
-        self.messages = []
+        self.messages = MessageStore(**(retention or {}))
         self.callstack = []
+        self.pipeline = LogPipeline(sinks) if sinks else None
+
+        # must be initiated and used as a decorator, with level 0 it starts switched off: log.FunctionProfiler.enable() or PYSU_TRACE=1
+        self.FunctionProfiler = FunctionProfiler(save, trace_engine, retention, tail, binary=binary_trace, enabled=level != 0, memory=memory)
 
         if(level == 0): #logging can get heavy. so you can turn off like this
             return 
 
-        self.FunctionProfiler = FunctionProfiler(save) # must be initiated and used as a decorator
-        stack = inspect.stack() 
-        self.caller = stack[1]  
-        self.base_structs = PyClassScanner(self.caller.filename).run() 
-        self.uml = self.generate_uml_diagram(self.base_structs)
+        import inspect # imported on use, import pysu should stay cheap
+        self.caller = inspect.getframeinfo(sys._getframe(1), context=0) # inspect.stack() would read the source of every frame
+        if(scan_cache is True and os.environ.get("PYSU_NO_CACHE") != "1"):
+            self.scan_cache = ScanCache()
+        elif(isinstance(scan_cache, str)):
+            self.scan_cache = ScanCache(scan_cache)
+        else:
+            self.scan_cache = None
+        self.base_structs = PyClassScanner(self.caller.filename, self.scan_cache).run() 
 
         if(linked):
-            linked_classes = self.find_linked_classes(self.caller.filename) # search for linked classes with #TOLOG
-            if(not linked_classes):
-                return
-            for i in range(len(linked_classes)): # get linked imports, must be in same folder
-                if(str(linked_classes[i]).find(".") != -1):
-                    linked_classes[i] = str(linked_classes[i]).split(".")[0]
-                    self.linked_structs = PyClassScanner(linked_classes[i]+".py").run()
-                    self.base_structs = self.combine_structs(self.base_structs,self.linked_structs)
-                    self.uml = self.generate_uml_diagram(self.base_structs)
+            linked_files = self.find_linked_files(self.caller.filename) # search for linked classes with #TOLOG
+            if(linked_files):
+                scanned = [ProjectScanner.qualify(path, PyClassScanner(path, self.scan_cache).run()) for path in linked_files]
+                base = ProjectScanner.qualify(self.caller.filename, self.base_structs) # equally named callers of different files stay apart
+                self.base_structs = merge_structs([base] + scanned) # merged once, not after each file
+        self.uml = self.generate_uml_diagram(self.base_structs)
 
         if(self.level == 3):   
             print("***********************************************************************")  
@@ -69,57 +101,97 @@ class pysu:
             print(self.uml)
             print("***********************************************************************")  
 
-        if(save):
+        if(save and not _in_worker()): # every worker would rewrite the same diagram
             with open("UML.txt","w") as f:
                 f.write(self.uml)
 
-        if(visualize): #To be done later
-            pass
-            #self.monitor_visualizer = MonitorVisualizer(self.classes_structs).main() #TBD LATER
+        if(visualize): # the visualization stack gets imported on first use
+            from pysu_visual import MonitorVisualizer
+            self.monitor_visualizer = MonitorVisualizer(self.base_structs)
+            if(save):
+                self.monitor_visualizer.to_html("UML.html")
 
 
     # Workers
     def info(self, message, console=False):
         """Takes an information and stores it into the message list, if console = True it gets printed instantly"""
         if self.level == 3:
-            self.messages.append({"mID": 3, "msg": message, "ts": time.time()})
-            if console:
-                print(message)
+            self.log(3, message, console)
 
     def warn(self, message, console=False):
         """Takes an warning and stores it into the message list, if console = True it gets printed instantly"""
         if self.level == 3 or self.level == 2:
-            self.messages.append({"mID": 2, "msg": message, "ts": time.time()})
-            if console:
-                print(message)
+            self.log(2, message, console)
 
     def error(self, message, console=True):
         """Takes an error and stores it into the message list, if console = True it gets printed instantly"""
-        self.messages.append({"mID": 1, "msg": message, "ts": time.time()})
-        if console:
+        self.log(1, message, console)
+
+    def log(self, mID, message, console=False, logger="pysu"):
+        """
+        Stores a message of level mID (1 error, 2 warning, 3 info), messages above the loglevel get dropped (errors never).
+        The message always lands in self.messages (and at a TraceCollector, if one listens). With sinks it also gets
+        enqueued for the LogPipeline, which does the console output and the file writes on its thread, else it gets printed instantly
+        """
+        if mID > 1 and mID > self.level:
+            return
+        self.messages.add(mID, message) # stamped inside the store lock, so the levels stay time ordered
+        self._forward(mID, message)
+        if self.pipeline is not None:
+            self.pipeline.put(PysuRecord(mID, message, time.perf_counter_ns(), logger, threading.get_ident(), console))
+        elif console:
             print(message)
-    
+
+    def handler(self, level=0):
+        """
+        Returns a logging.Handler that routes stdlib logging into this instance, e.g. logging.getLogger().addHandler(log.handler())
+        Args:
+            level (int) = logging level of the handler, the pysu loglevel filters as well
+        """
+        return _handler_class()(self, level)
+
+    def close(self):
+        """Writes out and stops the LogPipeline and closes the FunctionProfiler"""
+        if self.pipeline is not None:
+            self.pipeline.close()
+        self.FunctionProfiler.close()
+
     #Outputs
+    @staticmethod
+    def _forward(mID, message):
+        """Sends the message to the TraceCollector of the parent process, if one is listening"""
+        sink = _collector_sink()
+        if sink is not None:
+            sink.put({"mID": mID, "msg": message, "ts": time.time()}, "message")
+
     def get_errors(self) -> list:
         """Returns a list with all errors"""
-        return [eintrag for eintrag in self.messages if eintrag["mID"] == 1]
+        return self.messages.get_level(1)
 
     def get_warns(self) -> list:
         """Returns a list with all warnings"""
-        return [eintrag for eintrag in self.messages if eintrag["mID"] == 2]
+        return self.messages.get_level(2)
 
     def get_infos(self) -> list:
         """Returns a list with all informations"""
-        return [eintrag for eintrag in self.messages if eintrag["mID"] == 3]
+        return self.messages.get_level(3)
+
+    def get_between(self, mID, t0=None, t1=None) -> list:
+        """Returns the messages of level mID (1=error,2=warn,3=info) logged between the timestamps t0 and t1"""
+        return self.messages.get_between(mID, t0, t1)
+
+    def get_last(self, mID, n=10) -> list:
+        """Returns the newest n messages of level mID, e.g. get_last(1, 5) for the last 5 errors"""
+        return self.messages.get_last(mID, n)
 
     def show_logs(self):
         print("\n[LOGGINGS]")
         print(f"Loglevel {self.level}")
         if self.level == 1:
-            for log in [eintrag for eintrag in self.messages if eintrag["mID"] == 1]:
+            for log in self.get_errors():
                 print(log["msg"])
         elif self.level == 2:
-            for log in [eintrag for eintrag in self.messages if eintrag["mID"] == 1] + [eintrag for eintrag in self.messages if eintrag["mID"] == 2]:
+            for log in self.get_errors() + self.get_warns():
                 print(log["msg"])
         elif self.level == 3:
             for log in self.messages:
@@ -159,6 +231,27 @@ class pysu:
 
         return linked_classes
     
+    def find_linked_files(self, filename):
+        """
+        Resolves the '#TOLOG' imports of a file to source files, trough the directory of the file and sys.path.
+        For `from a.b import c` the module a.b.c is tried first, then a.b
+        Args:
+            filename (str)      = The path to the file to be parsed.
+        Returns:
+            linked_files (list) = unique paths of the linked source files
+        """
+        search_paths = [os.path.dirname(os.path.abspath(filename))] + sys.path
+        linked_files = {}
+        for name in self.find_linked_classes(filename):
+            path = resolve_module(name, search_paths)
+            if path is None and "." in name:
+                path = resolve_module(name.rsplit(".", 1)[0], search_paths)
+            if path is None:
+                print(f"pysu: linked module {name} not found")
+                continue
+            linked_files.setdefault(os.path.abspath(path))
+        return list(linked_files)
+
     def print_pretty(self,data):
         def format_method(method):
             params = ', '.join(param['name'] for param in method['parameters'])
@@ -208,26 +301,20 @@ class pysu:
 
     # Workers
 
-    def combine_structs(self,base, linked):
+    @staticmethod
+    def combine_structs(base, linked):
         """
         Combines 2 dicts and look out for empty lists, refer to readme for output
         Args:
             base (dict)   = return from PyClassScanner
             linked (dict) = return from PyClassScanner
         Returns:
-            combined      = combined dict from base and linked
+            combined      = combined dict from base and linked, refer to merge_structs
         """
-        combined = base.copy()  
-        combined['Classes'] = base['Classes'] + linked['Classes'] 
-        seen_class_names = set()
-        combined['Classes'] = [cls for cls in combined['Classes'] if not (cls['name'] in seen_class_names or seen_class_names.add(cls['name']))]
-
-        combined['CallHierarchy'] = base['CallHierarchy'] + linked['CallHierarchy']
-        seen_calls = set()  
-        combined['CallHierarchy'] = [ch for ch in combined['CallHierarchy'] if not (str(ch) in seen_calls or seen_calls.add(str(ch)))]
-        return combined
+        return merge_structs([base, linked])
 
-    def generate_uml_diagram(self, classes_structs):
+    @staticmethod
+    def generate_uml_diagram(classes_structs):
         """
         Generates an textual UML diagramm of the incoming classes_structs
         Args:
@@ -237,7 +324,7 @@ class pysu:
         """
         uml_output = []
         for class_entry in classes_structs.get("Classes", []):
-            class_name = class_entry["name"]
+            class_name = class_entry.get("qualname", class_entry["name"])
             methods = class_entry.get("methods", [])
             uml_output.append(f"class {class_name} {{")
             for method in methods:
@@ -254,7 +341,7 @@ class pysu:
         if call_hierarchy:
             uml_output.append("Call Hierarchy:")
             for call in call_hierarchy:
-                caller = call["name"]
+                caller = call.get("qualname", call["name"])
                 callees = call.get("callees", [])
                 # Format call relationships
                 callee_names = [callee["name"] for callee in callees]
@@ -264,347 +351,3786 @@ class pysu:
         return "\n".join(uml_output)
 
 
-# TBD Later, not happy rn
-class MonitorVisualizer:
-    def __init__(self, classes_structs):
-        raise NotImplementedError
-        self.classes_structs = classes_structs
-        self.G = nx.Graph()
-        self.pos = None
-        self.fig, self.ax = plt.subplots(figsize=(12, 10))
-        self.class_check_buttons = []
-        self.class_check_status = {}
-        self.create_graph()
-        self.create_positions()
-        self.draw_graph()
+def _estimate_size(obj, depth=6):
+    """Cheap recursive estimate of the bytes an object holds, containers are followed up to depth levels"""
+    size = sys.getsizeof(obj)
+    if depth:
+        if isinstance(obj, dict):
+            size += sum(_estimate_size(k, depth - 1) + _estimate_size(v, depth - 1) for k, v in obj.items())
+        elif isinstance(obj, (list, tuple, set)):
+            size += sum(_estimate_size(v, depth - 1) for v in obj)
+    return size
 
-    def __str__(self) -> str:
-        return f"MonitorVisualizer(classes_structs={self.classes_structs})"
-
-    def create_graph(self):
-        # Add classes, methods, and parameters to the graph
-        for cls in self.classes_structs["Classes"]:
-            class_name = cls["name"]
-            self.G.add_node(class_name, type="class")
-            # Add methods and parameters
-            for method in cls["methods"]:
-                method_name = method["name"]
-                self.G.add_node(method_name, type="method", class_name=class_name)
-                self.G.add_edge(class_name, method_name)
-                for param in method["parameters"]:
-                    param_name = param["name"]
-                    self.G.add_node(
-                        param_name, type="parameter", method_name=method_name
-                    )
-                    self.G.add_edge(method_name, param_name)
-
-    def create_positions(self):
-        """Create positions for nodes"""
-        self.pos = {}
-        angle_shift = 2 * np.pi / len(self.classes_structs["Classes"])
-        for i, cls in enumerate(self.classes_structs["Classes"]):
-            class_name = cls["name"]
-            angle = angle_shift * i
-            x = np.cos(angle)
-            y = np.sin(angle)
-            self.pos[class_name] = (x, y)
-            method_count = len(cls["methods"])
-            method_angle_shift = 2 * np.pi / max(1, method_count)
-            for j, method in enumerate(cls["methods"]):
-                method_name = method["name"]
-                angle = method_angle_shift * j
-                mx = x + np.cos(angle) * 0.5
-                my = y + np.sin(angle) * 0.5
-                self.pos[method_name] = (mx, my)
-                param_count = len(method["parameters"])
-                param_angle_shift = 2 * np.pi / max(1, param_count)
-                for k, param in enumerate(method["parameters"]):
-                    param_name = param["name"]
-                    angle = param_angle_shift * k
-                    px = mx + np.cos(angle) * 0.1
-                    py = my + np.sin(angle) * 0.1
-                    self.pos[param_name] = (px, py)
-
-    def draw_graph(self):
-        """Draw the nodes"""
-        node_types = nx.get_node_attributes(self.G, "type")
-        color_map = {
-            "class": "skyblue",
-            "method": "lightgreen",
-            "parameter": "lightcoral",
-        }
-        node_color = [color_map[node_types[node]] for node in self.G.nodes]
-        nx.draw(
-            self.G,
-            self.pos,
-            with_labels=True,
-            node_size=1500,
-            node_color=node_color,
-            font_size=7,
-            ax=self.ax,
-            node_shape="o",
-            edge_color="gray",
-        )
-        self.add_check_buttons()
-        plt.title("Class Structure Diagram")
-        plt.show()
-
-    def add_check_buttons(self):
-        """Create check buttons for each class to toggle visibility"""
-        classes = [cls["name"] for cls in self.classes_structs["Classes"]]
-        self.class_check_status = {cls: True for cls in classes}
-
-        ax_check = self.fig.add_axes([0.01, 0.2, 0.1, 0.6])
-        self.class_check_buttons = CheckButtons(
-            ax_check, classes, [True] * len(classes)
-        )
-
-        def toggle_class(label):
-            if label in self.class_check_status:
-                self.class_check_status[label] = not self.class_check_status[label]
-                self.update_graph()
-
-        self.class_check_buttons.on_clicked(toggle_class)
-
-    def update_graph(self):
-        """Clear the axis and redraw based on the current state of the check buttons"""
-        self.ax.clear()
-        self.ax.set_title("Class Structure Diagram")
-        # Collect all visible nodes
-        visible_classes = [
-            cls for cls, status in self.class_check_status.items() if status
-        ]
-        visible_nodes = set(visible_classes)  # Start with the visible classes
-        for cls in visible_classes: # Add methods and parameters of visible classes
-            methods = [
-                n
-                for n, d in self.G.nodes(data=True)
-                if d.get("type") == "method" and d.get("class_name") == cls
-            ]
-            visible_nodes.update(methods)
-            for method in methods:
-                params = [
-                    n
-                    for n, d in self.G.nodes(data=True)
-                    if d.get("type") == "parameter" and d.get("method_name") == method
-                ]
-                visible_nodes.update(params)
-
-        G_visible = self.G.subgraph(visible_nodes)# Create the subgraph with the collected visible nodes
-        node_types = nx.get_node_attributes(G_visible, "type")# Redraw the graph
-        color_map = {
-            "class": "skyblue",
-            "method": "lightgreen",
-            "parameter": "lightcoral",
-        }
-        node_color = [color_map[node_types[node]] for node in G_visible.nodes]
-
-        nx.draw(
-            G_visible,
-            self.pos,
-            with_labels=True,
-            node_size=1500,
-            node_color=node_color,
-            font_size=7,
-            ax=self.ax,
-            node_shape="o",
-            edge_color="gray",
-        )
-        plt.draw()
 
+class _LevelBuffer:
+    """
+    Columnar ring buffer of one level. Sequence numbers, timestamps and sizes live in typed arrays,
+    evicted rows are skipped by a head offset and compacted lazily, so eviction is O(1) amortized.
+    Not thread safe on its own, the BoundedStore owning it holds its lock around every access.
+    """
+    __slots__ = ("seq", "ts", "size", "items", "head")
+    COMPACT_AFTER = 1024
 
-class FunctionProfiler:
-    def __init__(self,save):
-        self.save = save
-        self.logs = [] 
+    def __init__(self):
+        self.seq = array("q")
+        self.ts = array("d")
+        self.size = array("q")
+        self.items = []
+        self.head = 0
 
-    def __str__(self):
-        return f"FunctionProfiler()"
+    def __len__(self):
+        return len(self.items) - self.head
 
-    def trace(self, func):
-        """Wrapper, to observe handed function."""
+    def append(self, seq, ts, size, item):
+        self.seq.append(seq)
+        self.ts.append(ts)
+        self.size.append(size)
+        self.items.append(item)
 
-        def wrapper(*args, **kwargs):
-            start_time = time.time()
-            aufruf_zeit = datetime.now().isoformat()
-            vtrace = []
-            vtrace.append(f"[PROFILER] Test of method: {func.__name__}")
-            vtrace.append(f"[PROFILER] Starttime: {aufruf_zeit}")
-            parameter_info = inspect.signature(func)
-            vtrace.append(f"[PROFILER] Parameter-signature: {parameter_info}")
-            vtrace.append(f"[PROFILER] Used parameters: args={args}, kwargs={kwargs}")
-            def trace_func(frame, event, arg):
-                if frame.f_code.co_name == "__init__": #return none, sooo..
-                    return
-                if event == "call":
-                    vtrace.append(f"[TRACE] Stepping into: {frame.f_code.co_name}")
-                elif event == "line":
-                    lokale_variablen = frame.f_locals
-                    try:
-                        vtrace.append(f"[TRACE] Methods variables value change. {frame.f_lineno}: {lokale_variablen}")
-                    except TypeError:
-                        pass
-                elif event == "return":
-                    vtrace.append(f"[TRACE] Step out of function: {frame.f_code.co_name} with return: {arg}")
-                return trace_func
+    def popleft(self):
+        """Removes the oldest row and returns (ts, size, item)"""
+        i = self.head
+        row = (self.ts[i], self.size[i], self.items[i])
+        self.items[i] = None
+        self.head += 1
+        if self.head >= self.COMPACT_AFTER and self.head * 2 >= len(self.items):
+            self._compact()
+        return row
 
-            sys.settrace(trace_func)  # Aktivieren des Tracers
-            try:
-                ergebnis = func(*args, **kwargs)
-            finally:
-                sys.settrace(None)  # Deaktivieren des Tracers
-            end_time = time.time()
-            dauer = end_time - start_time
-            vtrace.append(f"[PROFILER] Execution time: {dauer:.4f} seconds")
-            vtrace.append(f"[PROFILER] Result: {ergebnis}")
-            self.logs.append(
-                {
-                    "funktion": func.__name__,
-                    "startzeit": aufruf_zeit,
-                    "dauer": dauer,
-                    "args": "-".join(map(str, args)),
-                    "kwargs": kwargs,
-                    "ergebnis": str(ergebnis),
-                    "vtrace": vtrace 
-                }
-            )
-            return ergebnis
+    def first_seq(self):
+        return self.seq[self.head]
 
-        return wrapper
+    def rows(self, start=None, stop=None):
+        """Yields (seq, ts, item) for the physical index range, defaults to all kept rows"""
+        start = self.head if start is None else max(start, self.head)
+        stop = len(self.items) if stop is None else stop
+        seq, ts, items = self.seq, self.ts, self.items
+        for i in range(start, stop):
+            yield seq[i], ts[i], items[i]
 
-    def print_pretty_function_profile(self,data):
-        def format_trace(trace):
-            return '\n  '.join(trace)
+    def bisect_ts(self, t, right=False):
+        """Physical index of t in the time ordered ts column"""
+        if right:
+            return bisect_right(self.ts, t, self.head)
+        return bisect_left(self.ts, t, self.head)
 
-        # Formatierte Ausgabe
-        output = f"Function Profile:\n"
-        output += f"Function: {data['funktion']}\n"
-        output += f"Start Time: {data['startzeit']}\n"
-        output += f"Duration: {data['dauer']} seconds\n"
-        output += f"Arguments: {data['args']}\n"
-        output += f"Keyword Arguments: {json.dumps(data['kwargs'], indent=4)}\n"
-        output += f"Result: {data['ergebnis']}\n"
-        # Formatierte Trace-Ausgabe
-        if 'vtrace' in data:
-            output += f"\nTrace Log:\n"
-            output += format_trace(data['vtrace'])
+    def _compact(self):
+        h = self.head
+        del self.seq[:h]
+        del self.ts[:h]
+        del self.size[:h]
+        del self.items[:h]
+        self.head = 0
 
-        print(output)
-        print("***********************************************************************") 
 
-    def show_logs(self):
-        """Shows all saved logs"""
-        if(self.logs):
-            print("[TRACE LOGS]")
-            if(self.save):
-                with open("TRACE.json", "w") as f:
-                    f.write(str(self.logs).replace("'", '"'))
-            for log in self.logs:
-                self.print_pretty_function_profile(log)
+class BoundedStore:
+    """
+    Memory capped, list like storage for messages and trace logs. Records are kept in one ring buffer per level.
+    name        = name of the store, used for the spill file\
+    level_key   = callable record -> level, None puts everything into level 0\
+    max_entries = max records per level, int for all levels or dict {level: max}, None = unlimited\
+    max_bytes   = max estimated bytes of the whole store, None = unlimited\
+    policy      = "oldest" -> the oldest record of all levels gets evicted first\
+                  "keep_errors" -> records of the least important level (highest mID) get evicted first\
+    spill       = directory, evicted records get appended to <spill>/<name>.spill.jsonl instead of being dropped
+    """
+    POLICIES = ("oldest", "keep_errors")
 
-class PyClassScanner:
-    def __init__(self, input_filename):
+    def __init__(self, name="messages", level_key=None, max_entries=None, max_bytes=None, policy="oldest", spill=None):
+        if policy not in self.POLICIES:
+            raise Exception(f"Unknown retention policy {policy}, choose from {self.POLICIES}")
+        self.name = name
+        self.level_key = level_key
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.spill_path = os.path.join(spill, f"{name}.spill.jsonl") if spill else None
+        self._spill_file = None
+        self.levels = {} # level -> _LevelBuffer
+        self.seq = 0
+        self.count = 0
+        self.bytes = 0
+        self.dropped = {}
+        self.spilled = {}
+        self.last_ts = 0.0
+        self._lock = threading.RLock() # columns and counters of all levels change together
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self):
+        """Yields all kept records in insertion order, the level buffers get merged by sequence number"""
+        with self._lock: # rows are copied out, writers may go on while the caller iterates
+            rows = [[(seq, level, ts, item) for seq, ts, item in buffer.rows()] for level, buffer in self.levels.items()]
+        for _, level, ts, item in heapq.merge(*rows):
+            yield self._unpack(level, ts, item)
+
+    def __contains__(self, item) -> bool:
+        return any(record == item for record in self)
+
+    def _pack(self, record):
+        """Splits a record into (level, ts, item), the stored columns"""
+        return (self.level_key(record) if self.level_key else 0), 0.0, record
+
+    def _unpack(self, level, ts, item):
+        """Builds the record back from its columns"""
+        return item
+
+    def _size(self, item):
+        return _estimate_size(item)
+
+    def append(self, record):
+        """Stores a record and evicts until all caps are satisfied"""
+        level, ts, item = self._pack(record)
+        self._store(level, ts, item)
+
+    def _store(self, level, ts, item):
+        size = self._size(item) if self.max_bytes is not None else 0
+        cap = self.max_entries.get(level) if isinstance(self.max_entries, dict) else self.max_entries
+        with self._lock:
+            if ts is None: # taken under the lock and never behind the last one, get_between/get_last bisect over ts
+                ts = self.last_ts = max(time.time(), self.last_ts)
+            buffer = self.levels.get(level)
+            if buffer is None:
+                buffer = self.levels[level] = _LevelBuffer()
+            buffer.append(self.seq, ts, size, item)
+            self.seq += 1
+            self.count += 1
+            self.bytes += size
+            if cap is not None:
+                while len(buffer) > cap:
+                    self._evict(level)
+            if self.max_bytes is not None:
+                while self.bytes > self.max_bytes and self.count:
+                    self._evict(self._victim_level())
+
+    def get_level(self, level) -> list:
+        """Returns the kept records of one level in insertion order, O(k)"""
+        with self._lock:
+            buffer = self.levels.get(level)
+            if buffer is None:
+                return []
+            return [self._unpack(level, ts, item) for _, ts, item in buffer.rows()]
+
+    def get_between(self, level, t0=None, t1=None) -> list:
         """
-        Takes an filename and parses the classes out of the file
+        Returns the records of one level with t0 <= ts <= t1, found by bisection on the ts column
         Args:
-            filename (path) = The path to the to scanning file
+            level (int)  = the level to query
+            t0 (float)   = start timestamp, None = from the first record
+            t1 (float)   = end timestamp, None = until the last record
+        Returns:
+            records (list)
         """
-        self.input_filename = input_filename
-        self.classes = {}
-        self.call_hierarchy = {}
-        self.ouput_obj = {}
+        with self._lock:
+            buffer = self.levels.get(level)
+            if buffer is None:
+                return []
+            start = None if t0 is None else buffer.bisect_ts(t0)
+            stop = None if t1 is None else buffer.bisect_ts(t1, right=True)
+            return [self._unpack(level, ts, item) for _, ts, item in buffer.rows(start, stop)]
+
+    def get_last(self, level, n) -> list:
+        """Returns the newest n records of one level, oldest first"""
+        with self._lock:
+            buffer = self.levels.get(level)
+            if buffer is None or n <= 0:
+                return []
+            start = len(buffer.items) - min(n, len(buffer))
+            return [self._unpack(level, ts, item) for _, ts, item in buffer.rows(start)]
+
+    def clear(self):
+        """Removes all kept records, the counters stay"""
+        with self._lock:
+            self.levels.clear()
+            self.count = 0
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        """Returns how many records are kept and how many got dropped or spilled, per level"""
+        with self._lock:
+            return {
+                "kept": {level: len(buffer) for level, buffer in self.levels.items()},
+                "bytes": self.bytes,
+                "dropped": dict(self.dropped),
+                "spilled": dict(self.spilled),
+            }
+
+    def close(self):
+        """Closes the spill file"""
+        with self._lock:
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+
+    def _victim_level(self):
+        """Picks the level to evict from, according to the policy"""
+        filled = [level for level, buffer in self.levels.items() if len(buffer)]
+        if self.policy == "keep_errors":
+            return max(filled)
+        return min(filled, key=lambda level: self.levels[level].first_seq())
+
+    def _evict(self, level):
+        """Called with the lock held"""
+        ts, size, item = self.levels[level].popleft()
+        self.count -= 1
+        self.bytes -= size
+        if self.spill_path is None:
+            self.dropped[level] = self.dropped.get(level, 0) + 1
+            return
+        try:
+            if self._spill_file is None:
+                self._spill_file = open(self.spill_path, "a", encoding="utf-8")
+            self._spill_file.write(json.dumps(self._unpack(level, ts, item), default=str) + "\n")
+            self.spilled[level] = self.spilled.get(level, 0) + 1
+        except OSError as e:
+            print(f"pysu: spilling to {self.spill_path} failed: {e}")
+            self.dropped[level] = self.dropped.get(level, 0) + 1
+
+
+class MessageStore(BoundedStore):
+    """
+    BoundedStore for pysu messages. Only the columns are kept: the level is the buffer itself,
+    ts lives in the typed array and the message text gets interned. The {"mID", "msg", "ts"} dicts
+    are built on read. Without ts the store stamps the message itself, in order even across threads,
+    given timestamps must come in time order for the range queries.
+    """
+    def __init__(self, **retention):
+        super().__init__("messages", **retention)
+
+    def add(self, mID, msg, ts=None):
+        """Fast path for pysu.info/warn/error, no dict gets built. ts = time.time() stamp, None = now (under the store lock)"""
+        if type(msg) is str:
+            msg = sys.intern(msg)
+        self._store(mID, ts, msg)
+
+    def _pack(self, record):
+        msg = record["msg"]
+        if type(msg) is str:
+            msg = sys.intern(msg)
+        return record["mID"], record["ts"], msg
+
+    def _unpack(self, level, ts, item):
+        return {"mID": level, "msg": item, "ts": ts}
+
+    def _size(self, item):
+        return sys.getsizeof(item) + 24 # the seq/ts/size columns
+
+
+class _Deferred:
+    """Value of a record that gets rendered when the record is shown or saved, holds only a weak reference"""
+    __slots__ = ("ref", "renderer", "type_name")
+
+    def __init__(self, ref, renderer, type_name):
+        self.ref = ref
+        self.renderer = renderer
+        self.type_name = type_name
 
     def __str__(self):
-        return f"PyClassScanner(input_filename={self.input_filename})"
+        value = self.ref()
+        if value is None:
+            return f"<collected {self.type_name}>"
+        return self.renderer.render(value)
 
-    def _parse_file(self):
-        """Parses the input Python file and extracts class definitions."""
-        with open(self.input_filename, "r", encoding="utf-8", errors="ignore") as file:
-            tree = ast.parse(file.read(), filename=self.input_filename)
+    __repr__ = __str__
 
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef):
-                methods = self._extract_methods(node)
-                self.classes[node.name] = methods
 
-    def _extract_methods(self, class_node):
-        """
-        Extracts methods and their parameters from a class node.
-        Args:
-            class_node (Any) = The scanned class nodes
-        """
-        methods = {}
-        for item in class_node.body:
-            if isinstance(item, ast.FunctionDef):
-                method_name = item.name
-                parameters = [arg.arg for arg in item.args.args]
-                docstring = ast.get_docstring(item)  # Get the docstring of the method
-                methods[method_name] = {
-                    "parameters": parameters,
-                    "docstring": docstring,
-                }
-                self._track_calls(item)
-        return methods
+class _DeferredArgs:
+    """The positional arguments of a deferred record, rendered like before as "-" joined string"""
+    __slots__ = ("values",)
 
-    def _track_calls(self, method_node):
-        """
-        Tracks method calls inside the method body from method nodes.
-        Args:
-            method_node (Any) = The scanned method nodes
-        """
-        for node in ast.walk(method_node):
-            if isinstance(node, ast.Call):
-                if isinstance(node.func, ast.Attribute):
-                    caller = method_node.name
-                    callee = node.func.attr
-                    if caller not in self.call_hierarchy:
-                        self.call_hierarchy[caller] = []
-                    self.call_hierarchy[caller].append(callee)
+    def __init__(self, values):
+        self.values = values
 
-    def _measure_execution_time(self, method_node):
+    def __str__(self):
+        return "-".join(map(str, self.values))
+
+    __repr__ = __str__
+
+
+class ArgRenderer:
+    """
+    Bounded rendering of arguments, results and variable values for the trace records.
+    Big values never get repr'd completely, so the cost per value stays about constant.
+    max_len     = max characters of one rendered value\\
+    max_items   = containers/strings with more items only show the first ones\\
+    deferred    = True: keep weak references and render when the record gets shown or saved,
+                  values without weakref support (int, str, list, ..) are rendered right away\\
+    summarizers = {type: callable(value) -> str} for own types, refer register()
+    Arrays and DataFrames (everything with shape and dtype/columns) are summarized by shape and dtype.
+    """
+    def __init__(self, max_len=200, max_items=10, deferred=False, summarizers=None):
+        import reprlib # imported on use, import pysu should stay cheap
+        self.max_len = max_len
+        self.deferred = deferred
+        self.summarizers = dict(summarizers or {})
+        self._repr = reprlib.Repr()
+        self._repr.maxlevel = 3
+        self._repr.maxlist = self._repr.maxtuple = self._repr.maxset = self._repr.maxfrozenset = max_items
+        self._repr.maxdict = self._repr.maxdeque = self._repr.maxarray = max_items
+        self._repr.maxstring = self._repr.maxlong = self._repr.maxother = max_len
+
+    def register(self, type_, summarizer):
+        """Adds a summarizer for values of exactly this type"""
+        self.summarizers[type_] = summarizer
+
+    @staticmethod
+    def _summarize_shaped(value):
+        shape = getattr(value, "shape", None)
+        if shape is None or not (hasattr(value, "dtype") or hasattr(value, "columns")):
+            return None
+        dtype = getattr(value, "dtype", None)
+        if dtype is None: # DataFrame, one dtype per column
+            return f"<{type(value).__name__} shape={tuple(shape)} columns={len(value.columns)}>"
+        return f"<{type(value).__name__} shape={tuple(shape)} dtype={dtype}>"
+
+    def render(self, value):
+        """Returns a string of at most max_len characters, never raises"""
+        try:
+            summarizer = self.summarizers.get(type(value))
+            if summarizer is not None:
+                text = summarizer(value)
+            elif type(value) in (bytes, bytearray) and len(value) > self.max_len: # reprlib would repr them completely
+                text = f"{type(value).__name__}({value[:self.max_len]!r}...)"
+            else:
+                text = self._summarize_shaped(value) or self._repr.repr(value)
+        except Exception as e:
+            text = f"<unrepresentable {type(value).__name__}: {e}>"
+        if len(text) > self.max_len:
+            text = text[:self.max_len - 3] + "..."
+        return text
+
+    def capture(self, value):
+        """Renders now, or keeps a weak reference if deferred rendering is on and the value supports it"""
+        if self.deferred:
+            try:
+                return _Deferred(weakref.ref(value), self, type(value).__name__)
+            except TypeError:
+                pass
+        return self.render(value)
+
+    def capture_args(self, args):
+        if self.deferred:
+            return _DeferredArgs(tuple(self.capture(value) for value in args))
+        return "-".join(self.render(value) for value in args)
+
+    def capture_kwargs(self, kwargs):
+        return {name: self.capture(value) for name, value in kwargs.items()}
+
+
+_MISSING = object()
+_DEFAULT_RENDERER = None
+
+
+_PLAIN_TYPES = (float, bool, type(None)) # repr is short, exact and can't fail
+
+
+def _safe_repr(value):
+    """Bounded repr which never raises, broken __repr__ methods shouldn't kill the trace, big values get cut"""
+    global _DEFAULT_RENDERER
+    kind = type(value)
+    if kind in _PLAIN_TYPES or (kind is int and value.bit_length() <= 64) or (kind is str and len(value) <= 200):
+        return repr(value) # the hot case of line events, ArgRenderer/reprlib costs 10x more
+    if _DEFAULT_RENDERER is None:
+        _DEFAULT_RENDERER = ArgRenderer()
+    return _DEFAULT_RENDERER.render(value)
+
+
+_CONTAINERS = (list, dict, set, bytearray) # change in place, b.append(3) keeps the identity
+_PLAIN_KINDS = frozenset((int, float, str, bool, type(None), tuple, bytes)) # the usual locals, skip the isinstance
+
+
+class _Seen:
+    """Last seen state of a container variable: the object plus its length and bounded repr"""
+    __slots__ = ("value", "length", "text")
+
+    def __init__(self, value, length, text):
+        self.value = value
+        self.length = length
+        self.text = text
+
+
+def _local_deltas(previous, lokale_variablen, watch=None):
+    """
+    Compares the locals of a frame with the last seen values and returns only the changed ones.
+    Changes are detected by identity, so rebinding a name is cheap to detect and unchanged objects are never repr'd again.
+    Lists, dicts, sets and bytearrays can change in place, for them the length and the bounded repr get compared as well
+    (a change behind the cut of the repr that keeps the length stays unseen).
+    Args:
+        previous (dict)         = name -> last seen object (_Seen for containers) of this frame, updated in place
+        lokale_variablen (dict) = frame.f_locals
+        watch (tuple)           = only look at these names, None = all locals
+    Returns:
+        deltas (tuple)          = ((name, repr), ...) of the changed variables
+    """
+    deltas = []
+    if watch is None:
+        items = lokale_variablen.items()
+    else:
+        items = [(name, lokale_variablen[name]) for name in watch if name in lokale_variablen]
+    for name, value in items:
+        seen = previous.get(name, _MISSING)
+        if seen is value:
+            continue
+        if type(value) in _PLAIN_KINDS or not isinstance(value, _CONTAINERS):
+            previous[name] = value
+            deltas.append((name, _safe_repr(value)))
+            continue
+        length, text = len(value), _safe_repr(value)
+        if type(seen) is not _Seen or seen.value is not value or seen.length != length or seen.text != text:
+            previous[name] = _Seen(value, length, text)
+            deltas.append((name, text))
+    return tuple(deltas)
+
+
+class TraceScope:
+    """
+    Limits what one traced function records, everything outside the scope costs (almost) nothing.
+    modules = module names, called frames are only traced if they belong to one of them (or a submodule)\
+    paths   = directories/files, called frames are only traced if their file lies there\
+    lines   = (first, last) or a list of them, line events only inside these ranges of the decorated function's file\
+    watch   = variable names, only these get captured in the line events
+    The decorated function itself is always in scope. Frames outside get no local tracer at all.
+    """
+    __slots__ = ("root", "filename", "modules", "paths", "lines", "watch", "_frames", "_covered")
+
+    def __init__(self, func, modules=None, paths=None, lines=None, watch=None):
+        self.root = getattr(func, "__code__", None)
+        self.filename = self.root.co_filename if self.root is not None else None
+        self.modules = tuple([modules] if isinstance(modules, str) else modules) if modules else None
+        self.paths = tuple(os.path.abspath(path) for path in ([paths] if isinstance(paths, str) else paths)) if paths else None
+        if lines is not None:
+            ranges = [lines] if isinstance(lines, range) or (len(lines) == 2 and isinstance(lines[0], int)) else lines
+            lines = tuple((r.start, r.stop - 1) if isinstance(r, range) else (r[0], r[1]) for r in ranges)
+        self.lines = lines
+        self.watch = tuple([watch] if isinstance(watch, str) else watch) if watch else None
+        self._frames = {} # code -> in scope, decided once per code object
+        self._covered = {} # code -> has lines in the line ranges, same
+
+    def __repr__(self):
+        return f"TraceScope(modules={self.modules}, paths={self.paths}, lines={self.lines}, watch={self.watch})"
+
+    def includes(self, frame):
+        """True if frame should get a local tracer"""
+        code = frame.f_code
+        result = self._frames.get(code)
+        if result is None:
+            result = code is self.root or self._matches(frame)
+            self._frames[code] = result
+        return result
+
+    def _matches(self, frame):
+        if self.modules is not None:
+            module = frame.f_globals.get("__name__", "")
+            if not any(module == name or module.startswith(name + ".") for name in self.modules):
+                return False
+        if self.paths is not None:
+            filename = os.path.abspath(frame.f_code.co_filename)
+            if not any(filename == path or filename.startswith(path + os.sep) for path in self.paths):
+                return False
+        return True
+
+    def wants_line(self, filename, lineno):
+        """True if a line event at lineno should be recorded"""
+        if self.lines is None or filename != self.filename:
+            return True
+        return any(first <= lineno <= last for first, last in self.lines)
+
+    def covers(self, code):
+        """False if no line of code lies in the line ranges, its frames then need no line events"""
+        result = self._covered.get(code)
+        if result is None:
+            result = self.lines is None or code.co_filename != self.filename or any(
+                lineno is not None and self.wants_line(code.co_filename, lineno) for _, _, lineno in code.co_lines())
+            self._covered[code] = result
+        return result
+
+
+_TRACE_STACK = contextvars.ContextVar("pysu_trace_stack", default=())
+_CODE_NAMES = {} # code -> "module.qualname" of its frames in the call/return events
+
+
+def _code_name(code, frame):
+    """"module.qualname" of a running code object like the traced functions are named, A.run and B.run stay apart"""
+    name = _CODE_NAMES.get(code)
+    if name is None:
+        qualname = getattr(code, "co_qualname", code.co_name) # co_qualname needs python 3.11
+        name = _CODE_NAMES[code] = f"{frame.f_globals.get('__name__', '?')}.{qualname}"
+    return name
+
+
+_SUSPENDABLE = 0x20 | 0x80 | 0x200 # CO_GENERATOR | CO_COROUTINE | CO_ASYNC_GENERATOR, their return event may only be a yield
+
+
+class SettraceEngine:
+    """
+    Classic tracing backend, installs a sys.settrace hook while the traced call runs.
+    Every line of the traced function and of everything it calls goes trough a python callback.
+    The hook of an outer traced call gets restored afterwards, so nested traced calls work.
+
+    Engine protocol, used by FunctionProfiler.trace:
+        register(func)              once at decoration time
+        begin(func, vtrace) -> state    once per call
+        enter(state) -> token       before the call runs on this thread, for coroutines before every step
+        exit(state, token)          after the call or step, token comes from enter
+        pause() -> token / resume(token)    around the bookkeeping of a wrapper, so an outer traced call doesn't see it
+        set_enabled(func, on)       when the TraceSwitch of func flips
+    """
+    name = "settrace"
+
+    def register(self, func):
+        """Nothing to prepare at decoration time, the hook is set per call"""
+        pass
+
+    def set_enabled(self, func, on):
+        """Nothing to do, a disabled wrapper simply doesn't set the hook"""
+        pass
+
+    def begin(self, func, vtrace, scope=None):
         """
-        Measures the execution time of the given method.
+        Builds the trace function of one call, collecting call/line/return events into vtrace
         Args:
-            method_node (Any) = The scanned method nodes
+            func (callable) = The traced function
+            vtrace (list)   = The event buffer of the current call, refer to FunctionProfiler.format_event
+            scope (TraceScope) = which frames, lines and variables get recorded, None = everything
+        Returns:
+            trace_func      = the state for enter/exit
         """
-        start_time = time.time()
-        exec(compile(method_node, filename="<ast>", mode="exec"))# Execute the method standalone
-        end_time = time.time()
-        return end_time - start_time
+        clock = time.perf_counter_ns
+        watch = scope.watch if scope is not None else None
+        lines = scope is not None and scope.lines is not None
 
-    def _generate_json(self):
-        """Generates a JSON representation of the class structure and call hierarchy."""
-        diagram = {"Classes": []}
-        for class_name, methods in self.classes.items():
-            class_elem = {"name": class_name, "methods": []}
-            for method_name, method_info in methods.items():
-                method_elem = {
-                    "name": method_name,
-                    "parameters": [
-                        {"name": param} for param in method_info["parameters"]
-                    ],
-                    "docstring": method_info["docstring"]
-                    or "",  # Include docstring if it exists
-                }
-                class_elem["methods"].append(method_elem)
-            diagram["Classes"].append(class_elem)
-        diagram["CallHierarchy"] = []
-        for caller, callees in self.call_hierarchy.items():
-            caller_elem = {
-                "name": caller,
-                "callees": [{"name": callee} for callee in callees],
-            }
-            diagram["CallHierarchy"].append(caller_elem)
-        return diagram
+        def trace_func(frame, event, arg):
+            if frame.f_code.co_name == "__init__": #return none, sooo..
+                return
+            if frame.f_code.co_filename == __file__: # pysu's own frames (engine, wrappers of nested traced calls)
+                return
+            if event != "call":
+                return
+            if scope is not None and not scope.includes(frame): # out of scope: no local tracer, no line events
+                return
+            vtrace.append(("call", clock(), _code_name(frame.f_code, frame), None))
+            local_trace = frame.f_trace
+            if getattr(local_trace, "vtrace", None) is vtrace: # resumed coroutine/generator keeps its diff state
+                return local_trace
+            previous = {} # every frame diffs against its own locals
+            if lines and not scope.covers(frame.f_code):
+                frame.f_trace_lines = False # only the return event is needed
 
-    def run(self):
-        """WRAPPER Main function to generate the JSON diagram."""
-        if not os.path.isfile(self.input_filename):
-            raise FileNotFoundError(f"File {self.input_filename} not found.")
+            def local_trace(frame, event, arg):
+                if event == "line":
+                    if lines and not scope.wants_line(frame.f_code.co_filename, frame.f_lineno):
+                        return local_trace
+                    vtrace.append(("line", clock(), frame.f_lineno, _local_deltas(previous, frame.f_locals, watch)))
+                elif event == "return":
+                    vtrace.append(("return", clock(), _code_name(frame.f_code, frame), _safe_repr(arg)))
+                    if not frame.f_code.co_flags & _SUSPENDABLE: # the frame is done, don't keep its locals alive until the next gc run
+                        previous.clear()
+                return local_trace
+            local_trace.vtrace = vtrace
+            return local_trace
+        return trace_func
 
-        self._parse_file()
-        json_output = self._generate_json()
-        self.ouput_obj = json_output
-        return json_output
+    def enter(self, state):
+        previous = sys.gettrace()
+        sys.settrace(state)  # Aktivieren des Tracers
+        return previous
+
+    def exit(self, state, token):
+        sys.settrace(token)  # Tracer des aeusseren Aufrufs wiederherstellen
+
+    def pause(self):
+        previous = sys.gettrace()
+        if previous is not None:
+            sys.settrace(None)
+        return previous
+
+    def resume(self, token):
+        if token is not None:
+            sys.settrace(token)
+
+    def run(self, func, vtrace, args, kwargs, scope=None):
+        """Executes func traced into vtrace and returns its result"""
+        state = self.begin(func, vtrace, scope)
+        token = self.enter(state)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.exit(state, token)
+
+
+class _MonitoringTool:
+    """
+    The sys.monitoring tool of pysu, one per process. Every MonitoringEngine shares it and the last one to close
+    gives the tool id back, so any number of profilers only ever take one id.
+    While a traced function is enabled PY_START (and PY_UNWIND) fire for all code: the first time a code object
+    starts inside a traced call and in its scope, it gets its own line/return events. Outside of traced calls
+    the callbacks return right away, a started python function costs ~70ns more then.
+    """
+    TOOL_IDS = (3, 4) # the slots without a reserved user, 0/1/2/5 belong to debugger/coverage/profiler/optimizer
+    _lock = threading.Lock()
+    _shared = None
+
+    @classmethod
+    def acquire(cls):
+        """Returns the tool of this process and counts one more user, claims a tool id on first use"""
+        with cls._lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            cls._shared.users += 1
+            return cls._shared
+
+    def __init__(self):
+        if not hasattr(sys, "monitoring"):
+            raise RuntimeError("sys.monitoring needs python 3.12 or newer")
+        mon = sys.monitoring
+        self.tool_id = None
+        for tool_id in self.TOOL_IDS:
+            if mon.get_tool(tool_id) is None:
+                mon.use_tool_id(tool_id, "pysu")
+                self.tool_id = tool_id
+                break
+        if self.tool_id is None:
+            taken = ", ".join(f"{tool_id}={mon.get_tool(tool_id)!r}" for tool_id in self.TOOL_IDS)
+            raise RuntimeError(f"sys.monitoring tool ids {list(self.TOOL_IDS)} are all in use ({taken})")
+        self.users = 0
+        self.roots = {} # code of a decorated function -> engines which have it enabled
+        self.local = {} # code -> local event mask set on it, roots and the callees seen so far
+        events = mon.events
+        self.root_events = events.PY_START | events.PY_RESUME | events.LINE | events.PY_RETURN | events.PY_YIELD
+        self.line_event = events.LINE
+        self.callee_events = events.PY_RESUME | events.PY_RETURN | events.PY_YIELD # LINE only if the scope wants lines of the code
+        mon.register_callback(self.tool_id, events.PY_START, self._on_start)
+        mon.register_callback(self.tool_id, events.PY_RESUME, self._on_start)
+        mon.register_callback(self.tool_id, events.LINE, self._on_line)
+        mon.register_callback(self.tool_id, events.PY_RETURN, self._on_return)
+        mon.register_callback(self.tool_id, events.PY_YIELD, self._on_yield)
+        mon.register_callback(self.tool_id, events.PY_UNWIND, self._on_unwind)
+
+    def release(self):
+        """Counts one user less, the last one switches every event off and frees the tool id"""
+        with self._lock:
+            self.users -= 1
+            if self.users > 0:
+                return
+            mon = sys.monitoring
+            mon.set_events(self.tool_id, 0)
+            for code in self.local:
+                mon.set_local_events(self.tool_id, code, 0)
+            for event in (mon.events.PY_START, mon.events.PY_RESUME, mon.events.LINE, mon.events.PY_RETURN, mon.events.PY_YIELD, mon.events.PY_UNWIND):
+                mon.register_callback(self.tool_id, event, None)
+            mon.free_tool_id(self.tool_id)
+            self.local.clear()
+            self.roots.clear()
+            type(self)._shared = None
+
+    def set_root(self, code, on):
+        """Counts code of a decorated function in or out, PY_START runs globally while any root is enabled"""
+        with self._lock:
+            count = self.roots.get(code, 0) + (1 if on else -1)
+            if count > 0:
+                self.roots[code] = count
+                self._set_local(code, self.root_events)
+            else:
+                self.roots.pop(code, None)
+                self.local.pop(code, None) # can come back as callee of another traced call
+                sys.monitoring.set_local_events(self.tool_id, code, 0)
+            events = sys.monitoring.events
+            sys.monitoring.set_events(self.tool_id, events.PY_START | events.PY_UNWIND if self.roots else 0)
+
+    def _set_local(self, code, mask):
+        mask |= self.local.get(code, 0)
+        if self.local.get(code) != mask:
+            self.local[code] = mask
+            sys.monitoring.set_local_events(self.tool_id, code, mask)
+
+    @staticmethod
+    def _owner(code, depth=2):
+        """(state, frame) of the traced call code runs in, None if no traced call runs or code is not in its scope"""
+        stack = _TRACE_STACK.get()
+        if not stack or stack[-1] is None: # nothing traced, or a wrapper does its bookkeeping
+            return None
+        state = stack[-1]
+        scope = state[3]
+        frame = sys._getframe(depth) # the frame of code, behind the callback
+        if scope is not None and code is not state[0] and not scope.includes(frame):
+            return None
+        return state, frame
+
+    def _on_start(self, code, instruction_offset):
+        owner = self._owner(code)
+        if owner is None:
+            return
+        (root, vtrace, frames, scope), frame = owner
+        if code is not root:
+            if code.co_filename == __file__ or code.co_name == "__init__": # like SettraceEngine: pysu itself and __init__ stay out
+                return
+            if not self.local.get(code, 0) & self.line_event:
+                self._set_local(code, self.callee_events | (self.line_event if scope is None or scope.covers(code) else 0))
+        frames.setdefault(frame, {}) # every frame diffs against its own locals
+        vtrace.append(("call", time.perf_counter_ns(), _code_name(code, frame), None))
+
+    def _on_line(self, code, line_number):
+        owner = self._owner(code)
+        if owner is None:
+            return
+        (root, vtrace, frames, scope), frame = owner
+        if scope is None:
+            vtrace.append(("line", time.perf_counter_ns(), line_number, _local_deltas(frames.setdefault(frame, {}), frame.f_locals)))
+        elif scope.wants_line(code.co_filename, line_number): # no DISABLE otherwise, the code may be traced by other scopes too
+            vtrace.append(("line", time.perf_counter_ns(), line_number, _local_deltas(frames.setdefault(frame, {}), frame.f_locals, scope.watch)))
+
+    def _on_yield(self, code, instruction_offset, retval):
+        owner = self._owner(code)
+        if owner is not None:
+            owner[0][1].append(("return", time.perf_counter_ns(), _code_name(code, owner[1]), _safe_repr(retval)))
+
+    def _on_return(self, code, instruction_offset, retval, depth=2):
+        owner = self._owner(code, depth)
+        if owner is not None:
+            (root, vtrace, frames, scope), frame = owner
+            vtrace.append(("return", time.perf_counter_ns(), _code_name(code, frame), _safe_repr(retval)))
+            frames.pop(frame, None) # the frame is done, don't keep its locals alive
+
+    def _on_unwind(self, code, instruction_offset, exception):
+        if code in self.local: # left by an exception, settrace reports that as a return of None
+            self._on_return(code, instruction_offset, None, 3)
+
+
+class MonitoringEngine(SettraceEngine):
+    """
+    Low overhead tracing backend on top of PEP 669 sys.monitoring (python 3.12+).
+    Records the same events as SettraceEngine, the decorated function and the code it calls (inside its TraceScope),
+    but only code that ran inside a traced call gets line events, refer to _MonitoringTool.
+    The running calls live in a ContextVar, so every thread and asyncio task only writes into its own vtrace.
+    All engines of a process share one tool id, close() gives this engine's share back.
+    """
+    name = "monitoring"
+
+    def __init__(self):
+        self.tool = _MonitoringTool.acquire()
+        self.codes = set() # enabled codes of the functions registered here
+
+    def register(self, func):
+        """Enables the local events for the code object of func, called once at decoration time"""
+        self.set_enabled(func, True)
+
+    def set_enabled(self, func, on):
+        """Switches the local events of func on/off, disabled code runs without any callback"""
+        code = getattr(func, "__code__", None)
+        if code is None or self.tool is None or (code in self.codes) == on:
+            return
+        if on:
+            self.codes.add(code)
+        else:
+            self.codes.discard(code)
+        self.tool.set_root(code, on)
+
+    def begin(self, func, vtrace, scope=None):
+        return (getattr(func, "__code__", None), vtrace, {}, scope)
+
+    def enter(self, state):
+        return _TRACE_STACK.set(_TRACE_STACK.get() + (state,))
+
+    def exit(self, state, token):
+        _TRACE_STACK.reset(token)
+
+    def pause(self):
+        return _TRACE_STACK.set(_TRACE_STACK.get() + (None,)) # the wrapper's own calls (rendering, sinks) stay out of the outer trace
+
+    def resume(self, token):
+        _TRACE_STACK.reset(token)
+
+    def close(self):
+        """Switches the functions of this engine off and gives its share of the tool back, the engine is unusable afterwards"""
+        if self.tool is not None:
+            for code in self.codes:
+                self.tool.set_root(code, False)
+            self.codes.clear()
+            self.tool.release()
+            self.tool = None
+
+
+@types.coroutine
+def _drive_traced(coro, engine, state, busy):
+    """
+    Runs a coroutine step by step for FunctionProfiler.trace. The engine is only entered while the coroutine
+    itself runs on the loop, other tasks stay untraced. busy sums up the ns of these steps: [wall, thread cpu, process cpu].
+    """
+    send, throw = None, None
+    while True:
+        thread_ns, process_ns = time.thread_time_ns(), time.process_time_ns()
+        start_ns = time.perf_counter_ns()
+        token = engine.enter(state)
+        try:
+            if throw is None:
+                yielded = coro.send(send)
+            else:
+                yielded = coro.throw(throw)
+        except StopIteration as e:
+            return e.value
+        finally:
+            engine.exit(state, token)
+            busy[0] += time.perf_counter_ns() - start_ns
+            busy[1] += time.thread_time_ns() - thread_ns
+            busy[2] += time.process_time_ns() - process_ns
+        try:
+            send, throw = (yield yielded), None
+        except GeneratorExit:
+            coro.close()
+            raise
+        except BaseException as e:
+            send, throw = None, e
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler, a background thread reads the stacks of all threads with sys._current_frames()
+    and counts which functions and lines it sees. Cheap enough to leave on for live traffic.
+    rate        = samples per second, 100-1000 is sensible\\
+    profiler    = FunctionProfiler, gets the result as a log record on stop(), None = keep it here only\\
+    top         = how many functions/lines go into the log record\\
+    max_depth   = stack frames walked per thread and sample
+    Use it as context manager or with start()/stop(), FunctionProfiler.sample() creates one for you.
+    """
+    def __init__(self, rate=100, profiler=None, top=50, max_depth=128):
+        self.interval = 1.0 / rate
+        self.rate = rate
+        self.profiler = profiler
+        self.top = top
+        self.max_depth = max_depth
+        self.samples = 0
+        self.self_hits = {}  # code object -> samples where it was the running frame
+        self.total_hits = {} # code object -> samples where it was anywhere on the stack
+        self.line_hits = {}  # (code object, line number) -> samples
+        self._lock = threading.Lock() # the sampler thread counts while report() reads
+        self._thread = None
+        self._stop = threading.Event()
+        self._started_at = None
+        self._start_time = 0.0
+
+    def __str__(self):
+        return f"SamplingProfiler(rate={self.rate}, samples={self.samples})"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._started_at = datetime.now().isoformat()
+            self._start_time = time.perf_counter()
+            self._thread = threading.Thread(target=self._run, name="pysu-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stops sampling and hands the result to the profiler, if there is one"""
+        if self._thread is None:
+            return None
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        record = self.to_record()
+        if self.profiler is not None:
+            self.profiler.add_log(record)
+        return record
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id != own_id:
+                        self._count(frame)
+
+    def _count(self, frame):
+        self.samples += 1
+        code = frame.f_code
+        self.self_hits[code] = self.self_hits.get(code, 0) + 1
+        line = (code, frame.f_lineno)
+        self.line_hits[line] = self.line_hits.get(line, 0) + 1
+        seen = set() # recursion counts once per sample
+        depth = 0
+        while frame is not None and depth < self.max_depth:
+            code = frame.f_code
+            if code not in seen:
+                seen.add(code)
+                self.total_hits[code] = self.total_hits.get(code, 0) + 1
+            frame = frame.f_back
+            depth += 1
+
+    @staticmethod
+    def _where(code):
+        return f"{code.co_filename}:{code.co_firstlineno}({code.co_name})"
+
+    def report(self, top=None):
+        """
+        Returns the hottest functions and lines
+        Args:
+            top (int)       = how many entries per list, None = self.top
+        Returns:
+            report (dict)   = {"functions": [{name, self, total, self_pct, total_pct}], "lines": [{line, hits, pct}]}
+        """
+        top = top or self.top
+        with self._lock: # copies, the sampler may go on while they get sorted
+            samples = max(self.samples, 1)
+            self_hits, total_hits, line_hits = dict(self.self_hits), dict(self.total_hits), dict(self.line_hits)
+        functions = sorted(total_hits.items(), key=lambda item: (self_hits.get(item[0], 0), item[1]), reverse=True)
+        lines = sorted(line_hits.items(), key=lambda item: item[1], reverse=True)
+        return {
+            "functions": [
+                {
+                    "name": self._where(code),
+                    "self": self_hits.get(code, 0),
+                    "total": total,
+                    "self_pct": round(100 * self_hits.get(code, 0) / samples, 2),
+                    "total_pct": round(100 * total / samples, 2),
+                }
+                for code, total in functions[:top]
+            ],
+            "lines": [
+                {"line": f"{code.co_filename}:{lineno}({code.co_name})", "hits": hits, "pct": round(100 * hits / samples, 2)}
+                for (code, lineno), hits in lines[:top]
+            ],
+        }
+
+    def to_record(self):
+        """Builds a log record in the shape FunctionProfiler.logs uses"""
+        dauer = time.perf_counter() - self._start_time
+        report = self.report()
+        return {
+            "funktion": "[SAMPLING]",
+            "startzeit": self._started_at,
+            "dauer": dauer,
+            "samples": self.samples,
+            "rate": self.rate,
+            "functions": report["functions"],
+            "lines": report["lines"],
+        }
+
+
+TRACE_ENGINES = {"settrace": SettraceEngine, "monitoring": MonitoringEngine}
+
+
+def _numpy():
+    """numpy if installed, imported on first use so import pysu stays cheap"""
+    try:
+        import numpy
+        return numpy
+    except ImportError:
+        return None
+
+
+class LatencyHistogram:
+    """
+    Fixed memory latency histogram with log spaced buckets, every bucket is `growth` times wider than the one before,
+    so percentiles have a relative error of about (growth-1)/2 over the whole range. The counts live in an array('q'),
+    merging and reporting work on a NumPy view of it if NumPy is installed, so only those import it, not the traced calls.
+    A histogram can be merged with others of the same layout.
+    lowest_ns   = everything below lands in the first bucket\\
+    highest_ns  = everything above lands in the last bucket\\
+    growth      = width factor between buckets, 1.02 -> ~1% error and ~930 buckets for 1us..100s
+    """
+    PERCENTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99, "p999": 0.999}
+
+    def __init__(self, lowest_ns=1_000, highest_ns=100_000_000_000, growth=1.02):
+        self.lowest_ns = lowest_ns
+        self.highest_ns = highest_ns
+        self.growth = growth
+        self._log_growth = math.log(growth)
+        self.size = int(math.ceil(math.log(highest_ns / lowest_ns) / self._log_growth)) + 1
+        self.counts = array("q", bytes(8 * self.size))
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        return f"LatencyHistogram(count={self.count}, buckets={self.size})"
+
+    def _index(self, ns):
+        if ns <= self.lowest_ns:
+            return 0
+        return min(int(math.log(ns / self.lowest_ns) / self._log_growth), self.size - 1)
+
+    def record(self, ns):
+        """Adds one latency in nanoseconds"""
+        i = self._index(ns)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += ns
+            if self.min is None or ns < self.min:
+                self.min = ns
+            if self.max is None or ns > self.max:
+                self.max = ns
+
+    def _layout(self):
+        return (self.lowest_ns, self.highest_ns, self.growth)
+
+    def merge(self, other):
+        """Adds the counts of another histogram with the same layout, e.g. from another interval or process"""
+        if other._layout() != self._layout():
+            raise Exception(f"Cannot merge histograms with different layouts {self._layout()} and {other._layout()}")
+        with self._lock:
+            np = _numpy()
+            if np is not None:
+                counts = np.frombuffer(self.counts, dtype=np.int64) # writable view, no copy
+                counts += np.frombuffer(other.counts, dtype=np.int64)
+            else:
+                for i, n in enumerate(other.counts):
+                    if n:
+                        self.counts[i] += n
+            self.count += other.count
+            self.sum += other.sum
+            if other.min is not None:
+                self.min = other.min if self.min is None else min(self.min, other.min)
+                self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def copy(self):
+        twin = LatencyHistogram(self.lowest_ns, self.highest_ns, self.growth)
+        return twin.merge(self)
+
+    def reset(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self.counts = array("q", bytes(8 * self.size))
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def snapshot(self, reset=False):
+        """Returns a mergeable copy, with reset=True the histogram starts a new interval at the same time"""
+        with self._lock: # copy and reset in one go, a record in between would get lost
+            twin = LatencyHistogram(self.lowest_ns, self.highest_ns, self.growth)
+            twin.counts = self.counts if reset else array("q", self.counts) # on reset the old counts move over
+            twin.count, twin.sum, twin.min, twin.max = self.count, self.sum, self.min, self.max
+            if reset:
+                self._clear()
+        return twin
+
+    def percentiles(self, quantiles=None):
+        """
+        Returns the latency in ns below which the given fractions of calls lie, e.g. {"p99": 0.99}
+        The upper edge of the bucket gets reported, clamped to the real min/max.
+        """
+        quantiles = quantiles or self.PERCENTILES
+        if not self.count:
+            return {name: None for name in quantiles}
+        ranks = [max(1, math.ceil(q * self.count)) for q in quantiles.values()]
+        np = _numpy()
+        if np is not None:
+            indices = np.searchsorted(np.cumsum(np.frombuffer(self.counts, dtype=np.int64)), ranks).tolist()
+        else:
+            cumulative = list(accumulate(self.counts))
+            indices = [bisect_left(cumulative, rank) for rank in ranks]
+        result = {}
+        for name, i in zip(quantiles, indices):
+            upper = self.lowest_ns * self.growth ** (i + 1)
+            result[name] = min(max(upper, self.min), self.max)
+        return result
+
+    def summary(self):
+        """count, sum, min, max, mean and percentiles, all times in ns"""
+        result = {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.sum / self.count if self.count else None,
+        }
+        result.update(self.percentiles())
+        return result
+
+
+_NESTED_CALLS = contextvars.ContextVar("pysu_nested_calls", default=None) # (start_ns, CallNode) of traced calls inside the running one
+
+
+class CallNode:
+    """
+    Node of a runtime call tree: one function at one call path, with the number of calls and the time spent.
+    inclusive_ns contains the children, exclusive_ns only the function itself.
+    """
+    __slots__ = ("name", "calls", "inclusive_ns", "children")
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.inclusive_ns = 0
+        self.children = {} # "module.qualname" -> CallNode
+
+    def __repr__(self):
+        return f"CallNode({self.name}, calls={self.calls}, inclusive_ns={self.inclusive_ns})"
+
+    @property
+    def exclusive_ns(self):
+        return max(self.inclusive_ns - sum(child.inclusive_ns for child in self.children.values()), 0)
+
+    def child(self, name):
+        node = self.children.get(name)
+        if node is None:
+            node = self.children[name] = CallNode(name)
+        return node
+
+    @classmethod
+    def from_events(cls, name, start_ns, end_ns, events, nested=()):
+        """
+        Builds the tree of one call from its vtrace call/return events
+        Args:
+            name (str)      = name of the traced function, the root
+            start_ns/end_ns = perf_counter_ns of the call
+            events (list)   = vtrace of the call, the outermost call/return pairs are the function itself
+            nested (list)   = (start_ns, CallNode) of traced calls made inside, they get attached where they started
+        Returns:
+            root (CallNode)
+        """
+        root = cls(name)
+        root.calls = 1
+        root.inclusive_ns = end_ns - start_ns
+        nested = sorted(nested, key=lambda entry: entry[0])
+        i = 0
+        stack = [] # (node, start) of the open frames, the first one is the function itself
+        for event in events:
+            kind, ns = event[0], event[1]
+            if kind != "call" and kind != "return":
+                continue
+            while i < len(nested) and nested[i][0] <= ns:
+                (stack[-1][0] if stack else root).child(nested[i][1].name).merge(nested[i][1])
+                i += 1
+            if kind == "call":
+                if not stack:
+                    stack.append((root, ns))
+                else:
+                    node = stack[-1][0].child(event[2])
+                    node.calls += 1
+                    stack.append((node, ns))
+            elif stack:
+                node, started = stack.pop()
+                if node is not root:
+                    node.inclusive_ns += ns - started
+        for node, started in stack: # frames left by an exception
+            if node is not root:
+                node.inclusive_ns += end_ns - started
+        for _, node in nested[i:]:
+            root.child(node.name).merge(node)
+        return root
+
+    def merge(self, other):
+        """Adds the counts and times of other (same function, same path) to this node"""
+        self.calls += other.calls
+        self.inclusive_ns += other.inclusive_ns
+        for name, node in other.children.items():
+            self.child(name).merge(node)
+        return self
+
+    def to_dict(self):
+        """JSON-ready tree"""
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "inclusive_ns": self.inclusive_ns,
+            "exclusive_ns": self.exclusive_ns,
+            "children": [node.to_dict() for node in sorted(self.children.values(), key=lambda node: -node.inclusive_ns)],
+        }
+
+    def folded(self, prefix=()):
+        """Folded stack lines "root;child;grandchild exclusive_ns", the input format of flamegraph.pl/speedscope"""
+        path = prefix + (self.name,)
+        lines = []
+        if self.exclusive_ns:
+            lines.append(f"{';'.join(path)} {self.exclusive_ns}")
+        for node in self.children.values():
+            lines.extend(node.folded(path))
+        return lines
+
+
+class JsonlSink:
+    """
+    Append only JSON Lines writer. Records get handed over trough a queue, a background thread encodes
+    and writes them in batches, so the traced thread never waits for the disk.
+    path            = target file, can be tailed while the process runs\
+    max_bytes       = rotate when the file gets bigger, None = no size rotation\
+    rotate_interval = rotate after so many seconds, None = no time rotation\
+    backup_count    = how many rotated files (path.1, path.2, ..) are kept\
+    batch_size      = max records per write\
+    flush_interval  = max seconds a record waits in the queue before it gets written
+    """
+    _FLUSH = object()
+    _STOP = object()
+
+    def __init__(self, path="TRACE.jsonl", max_bytes=50_000_000, rotate_interval=None, backup_count=5, batch_size=512, flush_interval=0.5):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.SimpleQueue()
+        self.written = 0
+        self.errors = 0
+        self._file = None
+        self._opened_at = 0.0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        return f"JsonlSink(path={self.path}, written={self.written})"
+
+    def put(self, record):
+        """Hands a record over to the writer thread, never blocks"""
+        if self._thread is None:
+            self._start()
+        self.queue.put(record)
+
+    def flush(self, timeout=None):
+        """Blocks until everything put so far is written"""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self.queue.put((self._FLUSH, done))
+        done.wait(timeout)
+
+    def close(self):
+        """Writes the remaining records and stops the writer thread"""
+        if self._thread is None:
+            return
+        self.queue.put(self._STOP)
+        self._thread.join()
+        self._thread = None
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="pysu-jsonl-sink", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        stop = False
+        while not stop:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch, events = [], []
+            while True:
+                if item is self._STOP:
+                    stop = True
+                elif type(item) is tuple and item and item[0] is self._FLUSH:
+                    events.append(item[1])
+                else:
+                    batch.append(item)
+                if stop or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+            for done in events:
+                done.set()
+        self._finish()
+
+    def _write(self, batch):
+        lines = []
+        for record in batch:
+            try:
+                lines.append(json.dumps(record, default=str, ensure_ascii=False))
+            except (TypeError, ValueError) as e:
+                self.errors += 1
+                lines.append(json.dumps({"pysu_error": f"record not encodable: {e}"}))
+        try:
+            self._emit(lines)
+            self.written += len(batch)
+        except OSError as e:
+            self.errors += len(batch)
+            print(f"pysu: writing to {self.path} failed: {e}")
+
+    def _emit(self, lines):
+        if self._file is None or self._needs_rotation():
+            self._rotate()
+        self._file.write("\n".join(lines) + "\n")
+        self._file.flush()
+
+    def _finish(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _needs_rotation(self):
+        if self.max_bytes is not None and self._file.tell() >= self.max_bytes:
+            return True
+        if self.rotate_interval is not None and time.time() - self._opened_at >= self.rotate_interval:
+            return True
+        return False
+
+    def _rotate(self):
+        """Shifts path -> path.1 -> path.2 .. and opens a fresh file, the first open just appends"""
+        if self._file is not None:
+            self._file.close()
+            _shift_backups(self.path, self.backup_count)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._opened_at = time.time()
+
+
+def _shift_backups(path, backup_count):
+    """Rotates path -> path.1 -> path.2 .., the oldest beyond backup_count gets overwritten"""
+    for i in range(backup_count - 1, 0, -1):
+        if os.path.exists(f"{path}.{i}"):
+            os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+    if backup_count > 0:
+        os.replace(path, f"{path}.1")
+    else:
+        os.remove(path)
+
+
+class CollectorSink(JsonlSink):
+    """
+    Sink of a child process, sends its records to the TraceCollector of the parent instead of writing a file.
+    The records travel as batches of JSON lines over a multiprocessing connection (unix socket/named pipe),
+    every line is {"kind": "trace"/"message", "pid": .., "record": {..}}.
+    address = address of the collector listener, "host:port" for TCP\
+    authkey = shared secret of the collector
+    """
+    def __init__(self, address, authkey, batch_size=512, flush_interval=0.2):
+        super().__init__(path=f"collector:{address}", max_bytes=None, batch_size=batch_size, flush_interval=flush_interval)
+        self.address = address
+        self.authkey = authkey
+        self._conn = None
+
+    def __str__(self):
+        return f"CollectorSink(address={self.address}, written={self.written})"
+
+    @classmethod
+    def from_env(cls):
+        """Sink for the collector announced in PYSU_COLLECTOR/PYSU_COLLECTOR_KEY, None if there is none"""
+        address = os.environ.get("PYSU_COLLECTOR")
+        if not address:
+            return None
+        return cls(address, bytes.fromhex(os.environ.get("PYSU_COLLECTOR_KEY", "")))
+
+    def put(self, record, kind="trace"):
+        super().put({"kind": kind, "pid": os.getpid(), "record": record})
+
+    def _start(self):
+        super()._start()
+        if _in_worker(): # multiprocessing children leave through os._exit, atexit never runs there
+            from multiprocessing.util import Finalize
+            Finalize(self, self.close, exitpriority=10)
+
+    def _emit(self, lines):
+        if self._conn is None:
+            from multiprocessing.connection import Client
+            host, _, port = self.address.rpartition(":")
+            address = (host, int(port)) if port.isdigit() else self.address
+            self._conn = Client(address, authkey=self.authkey)
+        self._conn.send_bytes("\n".join(lines).encode("utf-8"))
+
+    def _finish(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+TRACE_MAGIC = b"PYSUTRC1"
+TRACE_DTYPE = [("func", "<u4"), ("start_ns", "<i8"), ("duration_ns", "<i8"), ("thread", "<u8"), ("status", "u1")]
+_TRACE_ROW = struct.Struct("<IqqQB") # the same packed layout, used when NumPy isn't installed
+
+
+class BinaryTraceSink(JsonlSink):
+    """
+    Compact columnar trace: every finished call is one fixed size row of TRACE_DTYPE (29 bytes), function names
+    are interned into a string table. The rows get appended in chunks by the writer thread, so the file is one
+    contiguous array behind an 8 byte magic and TraceReader can memory-map it.
+    path        = data file, the string table is path + ".strings" (one JSON string per line, line number = func id)\
+    batch_size  = max rows per written chunk
+    """
+    STATUS_OK = 0
+    STATUS_RAISED = 1
+
+    def __init__(self, path="TRACE.pysutrace", batch_size=65536, flush_interval=0.5):
+        super().__init__(path, max_bytes=None, batch_size=batch_size, flush_interval=flush_interval)
+        self.strings_path = path + ".strings"
+        self.strings = {} # name -> func id
+        if os.path.exists(self.strings_path): # appending to an existing trace keeps its ids
+            with open(self.strings_path, encoding="utf-8") as f:
+                for line in f:
+                    self.strings.setdefault(json.loads(line), len(self.strings))
+
+    def __str__(self):
+        return f"BinaryTraceSink(path={self.path}, written={self.written})"
+
+    def intern(self, name):
+        """Returns the func id of name, new names get appended to the string table"""
+        func_id = self.strings.get(name)
+        if func_id is None:
+            with self._lock:
+                func_id = self.strings.get(name)
+                if func_id is None:
+                    with open(self.strings_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(name) + "\n")
+                    func_id = self.strings[name] = len(self.strings)
+        return func_id
+
+    def add(self, name, start_ns, duration_ns, raised=False):
+        """Queues one row, start_ns is wall clock (time.time_ns), never blocks"""
+        status = self.STATUS_RAISED if raised else self.STATUS_OK
+        self.put((self.intern(name), start_ns, duration_ns, threading.get_ident(), status))
+
+    def _write(self, batch):
+        np = _numpy()
+        if np is not None:
+            data = np.array(batch, dtype=TRACE_DTYPE).tobytes()
+        else:
+            data = b"".join(_TRACE_ROW.pack(*row) for row in batch)
+        try:
+            self._emit(data)
+            self.written += len(batch)
+        except OSError as e:
+            self.errors += len(batch)
+            print(f"pysu: writing to {self.path} failed: {e}")
+
+    def _emit(self, data):
+        if self._file is None:
+            self._file = open(self.path, "ab")
+            if self._file.tell() == 0:
+                self._file.write(TRACE_MAGIC)
+        self._file.write(data)
+        self._file.flush()
+
+
+class TraceReader:
+    """
+    Memory-maps a BinaryTraceSink file. The columns are views into the mapping, filters and aggregations
+    run over them without loading the file, aggregate() walks it in chunks so even hundreds of millions
+    of rows only need chunk sized temporaries. Needs NumPy.
+    path = data file of a BinaryTraceSink
+    """
+    CHUNK_ROWS = 1 << 22
+
+    def __init__(self, path="TRACE.pysutrace"):
+        np = _numpy()
+        if np is None:
+            raise ImportError("TraceReader needs numpy, pip install numpy")
+        self.path = path
+        self.dtype = np.dtype(TRACE_DTYPE)
+        self.names = []
+        if os.path.exists(path + ".strings"):
+            with open(path + ".strings", encoding="utf-8") as f:
+                self.names = [json.loads(line) for line in f]
+        with open(path, "rb") as f:
+            if f.read(len(TRACE_MAGIC)) != TRACE_MAGIC:
+                raise Exception(f"{path} is no pysu binary trace")
+        n = (os.path.getsize(path) - len(TRACE_MAGIC)) // self.dtype.itemsize # a torn last row gets ignored
+        if n:
+            self.rows = np.memmap(path, dtype=self.dtype, mode="r", offset=len(TRACE_MAGIC), shape=(n,))
+        else:
+            self.rows = np.zeros(0, dtype=self.dtype)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __str__(self):
+        return f"TraceReader(path={self.path}, rows={len(self.rows)}, functions={len(self.names)})"
+
+    def func_id(self, name):
+        return self.names.index(name)
+
+    def mask(self, func=None, thread=None, raised=None, start_ns=None, end_ns=None, min_duration_ns=None, rows=None):
+        """
+        Boolean mask over the rows, every given condition must hold
+        Args:
+            func (str/list)  = function name(s)
+            thread (int)     = thread ident
+            raised (bool)    = only failed/successful calls
+            start_ns/end_ns  = wall clock window the call started in
+            min_duration_ns  = only calls at least that slow
+            rows (ndarray)   = rows to filter, default all
+        Returns:
+            mask (ndarray of bool)
+        """
+        np = _numpy()
+        rows = self.rows if rows is None else rows
+        mask = np.ones(len(rows), dtype=bool)
+        if func is not None:
+            names = [func] if isinstance(func, str) else func
+            mask &= np.isin(rows["func"], [self.func_id(name) for name in names])
+        if thread is not None:
+            mask &= rows["thread"] == thread
+        if raised is not None:
+            mask &= (rows["status"] == BinaryTraceSink.STATUS_RAISED) == raised
+        if start_ns is not None:
+            mask &= rows["start_ns"] >= start_ns
+        if end_ns is not None:
+            mask &= rows["start_ns"] < end_ns
+        if min_duration_ns is not None:
+            mask &= rows["duration_ns"] >= min_duration_ns
+        return mask
+
+    def select(self, **conditions):
+        """The matching rows as a (copied) structured array, refer to mask for the conditions"""
+        return self.rows[self.mask(**conditions)]
+
+    def aggregate(self, rows=None):
+        """
+        Per function statistics, computed chunk by chunk
+        Args:
+            rows (ndarray)  = rows to aggregate (e.g. from select), default all
+        Returns:
+            stats (dict)    = name -> count, total_ns, mean_ns, min_ns, max_ns, errors
+        """
+        np = _numpy()
+        rows = self.rows if rows is None else rows
+        size = len(self.names)
+        count = np.zeros(size, dtype=np.int64)
+        total = np.zeros(size, dtype=np.int64)
+        errors = np.zeros(size, dtype=np.int64)
+        low = np.full(size, np.iinfo(np.int64).max, dtype=np.int64)
+        high = np.full(size, -1, dtype=np.int64)
+        for i in range(0, len(rows), self.CHUNK_ROWS):
+            chunk = rows[i:i + self.CHUNK_ROWS]
+            func = chunk["func"].astype(np.intp)
+            duration = chunk["duration_ns"]
+            count += np.bincount(func, minlength=size)
+            np.add.at(total, func, duration)
+            errors += np.bincount(func, weights=chunk["status"] == BinaryTraceSink.STATUS_RAISED, minlength=size).astype(np.int64)
+            np.minimum.at(low, func, duration)
+            np.maximum.at(high, func, duration)
+        return {
+            self.names[i]: {
+                "count": int(count[i]),
+                "total_ns": int(total[i]),
+                "mean_ns": int(total[i]) / int(count[i]),
+                "min_ns": int(low[i]),
+                "max_ns": int(high[i]),
+                "errors": int(errors[i]),
+            }
+            for i in np.flatnonzero(count)
+        }
+
+
+class TraceAnalyzer:
+    """
+    Offline analysis of trace files: TRACE.jsonl (rotated and worker files too), the older TRACE.json list and
+    binary TRACE.pysutrace files. JSON lines get streamed into compact columns (function id, duration, status,
+    where the record lies), binary files stay memory-mapped, the statistics run over the columns with NumPy.
+    The full record of a slow call is only read back from its file for the report. Needs NumPy.
+    top = slowest calls reported per function
+    """
+    PERCENTILES = LatencyHistogram.PERCENTILES
+
+    def __init__(self, top=10):
+        if _numpy() is None:
+            raise ImportError("TraceAnalyzer needs numpy, pip install numpy")
+        self.top = top
+        self.names = [] # function id -> name
+        self._ids = {}
+        self.files = [] # (path, kind) per added file, kind is "jsonl", "json" or "binary"
+        self._columns = [] # (func, duration_ns, raised, where) arrays per added file
+        self.records = 0
+        self.skipped = 0 # entries that are no call record (sampling reports, broken lines)
+
+    def __str__(self):
+        return f"TraceAnalyzer(files={len(self.files)}, records={self.records}, functions={len(self.names)})"
+
+    def _id(self, name):
+        func_id = self._ids.get(name)
+        if func_id is None:
+            func_id = self._ids[name] = len(self.names)
+            self.names.append(name)
+        return func_id
+
+    def add(self, path):
+        """
+        Adds a trace file, the format is recognized by its content. A directory adds its binary traces, or if
+        there are none its TRACE*.json/.jsonl files (rotated and per worker ones included), both hold the same calls
+        Returns:
+            self, so calls chain
+        """
+        if os.path.isdir(path):
+            names = sorted(os.listdir(path))
+            binary = [name for name in names if name.endswith(".pysutrace")]
+            for name in binary or [name for name in names if name.startswith("TRACE.") and ".json" in name]:
+                self.add(os.path.join(path, name))
+            return self
+        with open(path, "rb") as f:
+            head = f.read(len(TRACE_MAGIC))
+        if head == TRACE_MAGIC:
+            return self._add_binary(path)
+        if head.lstrip().startswith(b"["):
+            return self._add_json(path)
+        return self._add_jsonl(path)
+
+    def _call(self, record):
+        """(function id, duration ns, raised) of a call record, None for everything else"""
+        if not isinstance(record, dict) or "dauer" not in record or "funktion" not in record or "samples" in record:
+            return None
+        name = record.get("name", record["funktion"]) # "module.qualname", like the binary traces, older records only have the bare name
+        return self._id(name), round(record["dauer"] * 1e9), "fehler" in record
+
+    def _add_records(self, path, kind, entries):
+        """entries = (where, record) pairs, record None for unreadable ones"""
+        np = _numpy()
+        func, duration, raised, where = array("q"), array("q"), array("b"), array("q")
+        for position, record in entries:
+            call = self._call(record)
+            if call is None:
+                self.skipped += 1
+                continue
+            func.append(call[0])
+            duration.append(call[1])
+            raised.append(call[2])
+            where.append(position)
+        return self._append(path, kind, np.frombuffer(func, dtype=np.int64), np.frombuffer(duration, dtype=np.int64),
+                            np.frombuffer(raised, dtype=np.int8).astype(bool), np.frombuffer(where, dtype=np.int64))
+
+    def _add_jsonl(self, path):
+        def entries():
+            offset = 0
+            with open(path, "rb") as f:
+                for line in f:
+                    if line.strip():
+                        try:
+                            yield offset, json.loads(line)
+                        except ValueError: # torn last line of a running process
+                            yield offset, None
+                    offset += len(line)
+        return self._add_records(path, "jsonl", entries())
+
+    def _add_json(self, path):
+        """The list format of older versions, has to be loaded as a whole"""
+        return self._add_records(path, "json", enumerate(self._load_json(path)))
+
+    # fields of the records old versions wrote with str(logs).replace("'", '"'), which is no valid JSON
+    _LEGACY_FIELDS = re.compile(r'"(funktion|startzeit|dauer)":\s*(?:"([^"]*)"|([-+0-9.eE]+))')
+
+    @classmethod
+    def _load_json(cls, path):
+        """The records of a TRACE.json list, valid JSON or the legacy layout"""
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        try:
+            return json.loads(text)
+        except ValueError:
+            pass
+        records = []
+        for match in cls._LEGACY_FIELDS.finditer(text):
+            key, string, number = match.groups()
+            if key == "funktion":
+                records.append({})
+            if records and key not in records[-1]: # the first hit per record, vtrace lines can contain the same words
+                records[-1][key] = float(number) if key == "dauer" and number else string
+        if not records:
+            raise ValueError(f"{path} is neither JSON lines, a JSON list nor a TRACE.json of an older pysu version")
+        return records
+
+    def _add_binary(self, path):
+        np = _numpy()
+        reader = TraceReader(path)
+        ids = np.array([self._id(name) for name in reader.names] or [0], dtype=np.int64)
+        rows = reader.rows
+        return self._append(path, "binary", ids[rows["func"]], rows["duration_ns"],
+                            rows["status"] == BinaryTraceSink.STATUS_RAISED, np.arange(len(rows), dtype=np.int64))
+
+    def _append(self, path, kind, func, duration, raised, where):
+        self.files.append((path, kind))
+        self._columns.append((func, duration, raised, where))
+        self.records += len(func)
+        return self
+
+    def record(self, file, where, opened=None):
+        """
+        Reads the stored record of one call back
+        Args:
+            file (int)      = index in self.files
+            where (int)     = byte offset (jsonl), list index (json) or row (binary)
+            opened (dict)   = file index -> open file/loaded list/TraceReader, reused over many calls, refer to stats
+        Returns:
+            record (dict)   = startzeit, args and fehler (json) or startzeit and thread (binary)
+        """
+        path, kind = self.files[file]
+        opened = {} if opened is None else opened
+        source = opened.get(file)
+        if source is None:
+            if kind == "binary":
+                source = TraceReader(path)
+            elif kind == "jsonl":
+                source = open(path, "rb")
+            else:
+                source = self._load_json(path)
+            opened[file] = source
+        if kind == "binary":
+            row = source.rows[where]
+            return {"startzeit": datetime.fromtimestamp(int(row["start_ns"]) / 1e9).isoformat(), "thread": int(row["thread"])}
+        if kind == "jsonl":
+            source.seek(where)
+            record = json.loads(source.readline())
+        else:
+            record = source[where]
+        return {key: record[key] for key in ("startzeit", "args", "fehler") if key in record}
+
+    def stats(self, pattern=None):
+        """
+        Per function statistics over everything added, percentiles by nearest rank (exact, no buckets)
+        Args:
+            pattern (str)   = only functions matching this fnmatch pattern
+        Returns:
+            stats (dict)    = name -> count, errors, sum, min, max, mean, std, p50, p90, p99, p999 (ns, like
+                              FunctionProfiler.latency) and top: the slowest calls with duration_ns, raised,
+                              file, where and their record
+        """
+        np = _numpy()
+        if not self._columns:
+            return {}
+        func, duration, raised, where = (np.concatenate([columns[k] for columns in self._columns]) for k in range(4))
+        file = np.repeat(np.arange(len(self._columns)), [len(columns[0]) for columns in self._columns])
+        order = np.lexsort((duration, func)) # by function, inside by duration
+        counts = np.bincount(func, minlength=len(self.names))
+        errors = np.bincount(func, weights=raised, minlength=len(self.names))
+        ends = np.cumsum(counts)
+        sorted_duration = duration[order]
+        if pattern is not None:
+            import fnmatch
+        stats = {}
+        opened = {} # every file gets opened/loaded once for all the top records
+        try:
+            for i in np.flatnonzero(counts).tolist():
+                name = self.names[i]
+                if pattern is not None and not fnmatch.fnmatchcase(name, pattern):
+                    continue
+                end = int(ends[i])
+                start = end - int(counts[i])
+                values = sorted_duration[start:end]
+                n = len(values)
+                summary = {
+                    "count": n,
+                    "errors": int(errors[i]),
+                    "sum": int(values.sum()),
+                    "min": int(values[0]),
+                    "max": int(values[-1]),
+                    "mean": float(values.mean()),
+                    "std": float(values.std()),
+                }
+                for key, q in self.PERCENTILES.items():
+                    summary[key] = int(values[max(1, math.ceil(q * n)) - 1])
+                summary["top"] = [
+                    {
+                        "duration_ns": int(duration[k]),
+                        "raised": bool(raised[k]),
+                        "file": self.files[file[k]][0],
+                        "where": int(where[k]),
+                        "record": self.record(int(file[k]), int(where[k]), opened),
+                    }
+                    for k in order[max(start, end - self.top):end][::-1].tolist()
+                ]
+                stats[name] = summary
+        finally:
+            for source in opened.values():
+                if hasattr(source, "close"):
+                    source.close()
+        return stats
+
+    def report(self, pattern=None):
+        """stats() plus what got read, the JSON document of `python -m pysu analyze`"""
+        return {
+            "meta": {"files": [path for path, _ in self.files], "records": self.records, "skipped": self.skipped},
+            "functions": self.stats(pattern),
+        }
+
+
+def compare_traces(baseline, current, threshold=0.1, metrics=("p50", "p99"), min_count=1):
+    """
+    Compares the per function statistics of two runs
+    Args:
+        baseline (dict) = TraceAnalyzer.stats()/report() of the older run
+        current (dict)  = the same of the newer run
+        threshold (float) = relative change that counts, 0.1 -> 10% slower is a regression
+        metrics (tuple) = compared statistics, any key of the stats like p50, p99, mean, max
+        min_count (int) = functions with fewer calls in either run are left out, their percentiles are noise
+    Returns:
+        comparison (dict) = regressions and improvements (name, metric, old, new, ratio), compared/new/missing functions
+    """
+    old = baseline.get("functions", baseline)
+    new = current.get("functions", current)
+    regressions, improvements = [], []
+    compared = 0
+    for name in sorted(set(old) & set(new)):
+        if old[name]["count"] < min_count or new[name]["count"] < min_count:
+            continue
+        compared += 1
+        for metric in metrics:
+            before, after = old[name].get(metric), new[name].get(metric)
+            if not before or after is None:
+                continue
+            change = {"name": name, "metric": metric, "old": before, "new": after, "ratio": after / before}
+            if change["ratio"] > 1 + threshold:
+                regressions.append(change)
+            elif change["ratio"] < 1 / (1 + threshold):
+                improvements.append(change)
+    return {
+        "threshold": threshold,
+        "metrics": list(metrics),
+        "compared": compared,
+        "regressions": sorted(regressions, key=lambda change: change["ratio"], reverse=True),
+        "improvements": sorted(improvements, key=lambda change: change["ratio"]),
+        "new": sorted(set(new) - set(old)),
+        "missing": sorted(set(old) - set(new)),
+    }
+
+
+_COLLECTOR_SINK = _MISSING
+
+
+def _collector_sink():
+    """The CollectorSink of this process, None if no TraceCollector is listening"""
+    global _COLLECTOR_SINK
+    if _COLLECTOR_SINK is _MISSING:
+        _COLLECTOR_SINK = CollectorSink.from_env()
+    return _COLLECTOR_SINK
+
+
+_MAIN_PID = os.getpid()
+_PROFILERS = weakref.WeakSet() # every FunctionProfiler, their sinks get replaced in forked children
+_PIPELINES = weakref.WeakSet() # every LogPipeline, same story
+
+
+def _in_worker():
+    """True in forked children and multiprocessing workers"""
+    mp = sys.modules.get("multiprocessing") # only set if multiprocessing is used at all
+    return os.getpid() != _MAIN_PID or (mp is not None and mp.parent_process() is not None)
+
+
+def _trace_path(name="TRACE.jsonl"):
+    """Worker processes get their own trace file, so they don't write into the file of the parent"""
+    if _in_worker():
+        root, ext = os.path.splitext(name)
+        return f"{root}.{os.getpid()}{ext}"
+    return name
+
+
+def _after_fork_in_child():
+    """Threads don't survive fork: drop the inherited sinks and locks, the child builds its own on first use"""
+    global _COLLECTOR_SINK, _MEMORY_LOCK
+    _COLLECTOR_SINK = _MISSING
+    _MEMORY_LOCK = threading.Lock()
+    for profiler in list(_PROFILERS):
+        profiler._after_fork()
+    for pipeline in list(_PIPELINES):
+        pipeline._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+_CLOCK_ANCHOR = (time.time_ns(), time.perf_counter_ns()) # converts perf_counter_ns stamps to wall clock
+
+
+class PysuRecord:
+    """
+    One log message on its way through a LogPipeline. Only the perf_counter_ns stamp is taken on the logging
+    thread, the wall clock time gets derived from it when the record is written.
+    """
+    __slots__ = ("mID", "msg", "ns", "logger", "thread", "console")
+    LEVELS = {1: "ERROR", 2: "WARNING", 3: "INFO"}
+
+    def __init__(self, mID, msg, ns, logger="pysu", thread=None, console=False):
+        self.mID = mID
+        self.msg = msg
+        self.ns = ns
+        self.logger = logger
+        self.thread = thread
+        self.console = console
+
+    def __repr__(self):
+        return f"PysuRecord({self.LEVELS.get(self.mID, self.mID)}, {self.msg!r})"
+
+    @property
+    def ts(self):
+        """Wall clock time in seconds"""
+        return (_CLOCK_ANCHOR[0] + self.ns - _CLOCK_ANCHOR[1]) / 1e9
+
+    def to_dict(self):
+        return {"mID": self.mID, "level": self.LEVELS.get(self.mID, str(self.mID)), "msg": self.msg, "ts": self.ts,
+                "logger": self.logger, "thread": self.thread}
+
+    def format(self):
+        stamp = datetime.fromtimestamp(self.ts).isoformat(timespec="milliseconds")
+        return f"{stamp} {self.LEVELS.get(self.mID, self.mID)} {self.logger}: {self.msg}"
+
+
+class LogPipeline(JsonlSink):
+    """
+    QueueHandler/QueueListener style pipeline: the logging thread only enqueues a PysuRecord, one background
+    thread takes them in batches and hands every batch to all sinks (ConsoleLogSink, FileLogSink, JsonlLogSink).
+    sinks           = objects with write(batch) and close(), without a ConsoleLogSink one gets added so
+                      console=True records (errors by default) still show up\
+    batch_size      = max records per batch\
+    flush_interval  = max seconds a record waits before it gets written
+    """
+    def __init__(self, sinks=(), batch_size=512, flush_interval=0.2):
+        super().__init__(path="pipeline", max_bytes=None, batch_size=batch_size, flush_interval=flush_interval)
+        self.sinks = list(sinks)
+        if not any(isinstance(sink, ConsoleLogSink) for sink in self.sinks):
+            self.sinks.append(ConsoleLogSink())
+        _PIPELINES.add(self)
+
+    def __str__(self):
+        return f"LogPipeline(sinks={[type(sink).__name__ for sink in self.sinks]}, written={self.written})"
+
+    def _after_fork(self):
+        """The writer thread stayed in the parent, records still queued there belong to the parent"""
+        self.queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _write(self, batch):
+        for sink in self.sinks:
+            try:
+                sink.write(batch)
+            except Exception as e: # one broken sink must not stop the others
+                self.errors += len(batch)
+                print(f"pysu: {type(sink).__name__} failed: {e}")
+        self.written += len(batch)
+
+    def _finish(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+class ConsoleLogSink:
+    """
+    Writes records to a stream, one write per batch.
+    stream  = default sys.stderr\
+    level   = also print everything up to this mID (1 errors, 2 +warnings, 3 all), 0 = only records logged with console=True
+    """
+    def __init__(self, stream=None, level=0):
+        self.stream = stream
+        self.level = level
+
+    def write(self, batch):
+        lines = [record.format() for record in batch if record.console or record.mID <= self.level]
+        if lines:
+            stream = self.stream or sys.stderr
+            stream.write("\n".join(lines) + "\n")
+            stream.flush()
+
+    def close(self):
+        pass
+
+
+class FileLogSink:
+    """
+    Appends formatted records to a text file, rotated like the trace file.
+    path            = log file\
+    max_bytes       = rotate when the file gets bigger, None = never\
+    backup_count    = how many rotated files (path.1, path.2, ..) are kept
+    """
+    def __init__(self, path="LOG.txt", max_bytes=10_000_000, backup_count=5):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._file = None
+
+    def _line(self, record):
+        return record.format()
+
+    def write(self, batch):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        elif self.max_bytes is not None and self._file.tell() >= self.max_bytes:
+            self._file.close()
+            _shift_backups(self.path, self.backup_count)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write("\n".join(self._line(record) for record in batch) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class JsonlLogSink(FileLogSink):
+    """Like FileLogSink, but one JSON object per record"""
+    def __init__(self, path="LOG.jsonl", max_bytes=50_000_000, backup_count=5):
+        super().__init__(path, max_bytes, backup_count)
+
+    def _line(self, record):
+        return json.dumps(record.to_dict(), default=str, ensure_ascii=False)
+
+
+_HANDLER_CLASS = None
+
+
+def _handler_class():
+    """Builds PysuHandler on first use, so import pysu doesn't import logging"""
+    global _HANDLER_CLASS
+    if _HANDLER_CLASS is None:
+        import logging
+
+        class PysuHandler(logging.Handler):
+            """
+            logging.Handler that feeds stdlib logging records into a pysu instance: ERROR and above -> error,
+            WARNING -> warn, everything else -> info. The pysu level filter applies, emit never does I/O itself,
+            the records reach the sinks trough the LogPipeline of the pysu instance.
+            target  = pysu instance
+            """
+            def __init__(self, target, level=logging.NOTSET):
+                super().__init__(level)
+                self.target = target
+
+            def emit(self, record):
+                try:
+                    mID = 1 if record.levelno >= logging.ERROR else 2 if record.levelno >= logging.WARNING else 3
+                    self.target.log(mID, record.getMessage(), logger=record.name)
+                except Exception:
+                    self.handleError(record)
+
+        PysuHandler.__qualname__ = "PysuHandler"
+        _HANDLER_CLASS = PysuHandler
+    return _HANDLER_CLASS
+
+
+class TailPolicy:
+    """
+    Decides which finished calls keep their full record (vtrace and all), the others only count in the
+    latency histograms and FunctionProfiler.skipped. A call is kept if any active rule matches.
+    slower_ms   = keep calls that took longer, None = rule off\\
+    top_n       = keep the n slowest calls per function and window, None = rule off\\
+    window_s    = length of the top_n window in seconds\\
+    errors      = keep calls that raised an exception
+    """
+    def __init__(self, slower_ms=None, top_n=None, window_s=60.0, errors=True):
+        self.slower_ms = slower_ms
+        self.top_n = top_n
+        self.window_s = window_s
+        self.errors = errors
+        self._windows = {} # function name -> (window start, min heap of the kept durations)
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        return f"TailPolicy(slower_ms={self.slower_ms}, top_n={self.top_n}, window_s={self.window_s}, errors={self.errors})"
+
+    def keep(self, name, dauer, failed):
+        """
+        Args:
+            name (str)      = traced function
+            dauer (float)   = duration in seconds
+            failed (bool)   = the call raised
+        Returns:
+            keep (bool)     = True if the full record should be stored
+        """
+        if failed and self.errors:
+            return True
+        if self.slower_ms is not None and dauer * 1000 > self.slower_ms:
+            return True
+        if self.top_n:
+            return self._top(name, dauer)
+        return False
+
+    def _top(self, name, dauer):
+        now = time.monotonic()
+        with self._lock:
+            start, heap = self._windows.get(name, (None, None))
+            if start is None or now - start >= self.window_s:
+                heap = []
+                self._windows[name] = (now, heap)
+            if len(heap) < self.top_n:
+                heapq.heappush(heap, dauer)
+                return True
+            if dauer > heap[0]:
+                heapq.heapreplace(heap, dauer)
+                return True
+            return False
+
+
+_MEMORY_REGIONS = {} # id -> state of every measured call running right now, of all threads, tasks and MemoryTrackers
+_MEMORY_LOCK = threading.Lock() # reading and resetting the process wide tracemalloc peak is one step
+
+
+class MemoryTracker:
+    """
+    Opt-in memory mode of FunctionProfiler: peak and net allocated bytes of traced calls and the lines of the
+    traced code that allocated the most, measured with tracemalloc. Tracing allocations slows every allocation
+    of the process down, so tracemalloc only runs while a measured call is active (unless it was started elsewhere).
+    The peak is process wide, allocations of other threads running at the same time count in as well. Every begin()
+    resets it, so the peak gets folded into all calls measured right now first (nested ones and those of other threads).
+    every   = measure every n-th call per function, 1 = all\
+    top     = allocation sites recorded per call, 0 = skips the snapshots (much cheaper), but peak/net bytes then include
+              what pysu allocates for the trace record of the call (vtrace), with snapshots that part gets taken out\
+    frames  = stack depth tracemalloc keeps per allocation, > 1 finds the traced line behind library calls but costs more\
+    paths   = files/directories whose lines count as allocation sites too, besides the file of the traced function
+    """
+    def __init__(self, every=1, top=5, frames=1, paths=None):
+        import reprlib
+        import tracemalloc # imported on use, import pysu should stay cheap
+        self.tracemalloc = tracemalloc
+        self._own_files = (__file__, tracemalloc.__file__, reprlib.__file__) # pysu, its value rendering and the snapshots
+        self.every = max(int(every), 1)
+        self.top = top
+        self.frames = frames
+        self.paths = tuple(os.path.abspath(path) for path in paths or ())
+        self.counters = {} # "module.qualname" -> calls seen, for every
+        self.stats = {} # "module.qualname" -> [measured calls, max peak, sum of peaks, sum of net bytes]
+        self._active = 0
+        self._owns = False # tracemalloc got started here, so it gets stopped here
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        return f"MemoryTracker(every={self.every}, top={self.top}, frames={self.frames})"
+
+    def begin(self, name, filename):
+        """
+        Starts measuring a call
+        Args:
+            name (str)      = traced function "module.qualname"
+            filename (str)  = its source file, the allocation sites get filtered to it
+        Returns:
+            state (list)    = hand to end(), None if this call is not sampled
+        """
+        count = self.counters.get(name, 0)
+        self.counters[name] = count + 1
+        if count % self.every:
+            return None
+        tracemalloc = self.tracemalloc
+        with self._lock:
+            if not self._active and not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+                self._owns = True
+            self._active += 1
+        before = self._snapshot() if self.top else None # taken first, it allocates itself
+        with _MEMORY_LOCK:
+            current, peak = tracemalloc.get_traced_memory()
+            for region in _MEMORY_REGIONS.values(): # nested and concurrent calls, reset_peak would lose their peak
+                region[1] = max(region[1], peak)
+            tracemalloc.reset_peak()
+            state = [current, current, before, filename]
+            _MEMORY_REGIONS[id(state)] = state
+        return state
+
+    def end(self, name, state):
+        """
+        Finishes the measurement of begin()
+        Returns:
+            memory (dict)   = peak_bytes and net_bytes over the call start, top with the allocation sites if enabled
+        """
+        tracemalloc = self.tracemalloc
+        with _MEMORY_LOCK:
+            current, peak = tracemalloc.get_traced_memory()
+            del _MEMORY_REGIONS[id(state)]
+        start, peak_seen, before, filename = state
+        peak = max(peak, peak_seen) # the peak since the last reset, or one before it folded in by begin()
+        memory = {"peak_bytes": peak - start, "net_bytes": current - start}
+        if before is not None:
+            diff = self._snapshot().compare_to(before, "traceback")
+            overhead = memory["net_bytes"] - sum(stat.size_diff for stat in diff) # vtrace and records pysu built meanwhile
+            memory["net_bytes"] -= overhead
+            memory["peak_bytes"] = max(memory["peak_bytes"] - overhead, memory["net_bytes"], 0)
+            memory["top"] = self._sites(diff, filename)
+        with self._lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = [0, 0, 0, 0]
+            stats[0] += 1
+            stats[1] = max(stats[1], memory["peak_bytes"])
+            stats[2] += memory["peak_bytes"]
+            stats[3] += memory["net_bytes"]
+            self._active -= 1
+            if not self._active and self._owns:
+                tracemalloc.stop()
+                self._owns = False
+        return memory
+
+    def _snapshot(self):
+        """Snapshot without the allocations of pysu itself, refer to _own_files"""
+        tracemalloc = self.tracemalloc
+        return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, path) for path in self._own_files])
+
+    def _sites(self, diff, filename):
+        """Groups the allocation differences by the innermost line of the traced code, largest first"""
+        sites = {}
+        for stat in diff:
+            if not stat.size_diff and not stat.count_diff:
+                continue
+            for frame in stat.traceback: # most recent first
+                if frame.filename == filename or frame.filename.startswith(self.paths or (filename,)):
+                    site = f"{frame.filename}:{frame.lineno}"
+                    entry = sites.setdefault(site, {"site": site, "size_diff": 0, "count_diff": 0})
+                    entry["size_diff"] += stat.size_diff
+                    entry["count_diff"] += stat.count_diff
+                    break
+        return sorted(sites.values(), key=lambda entry: abs(entry["size_diff"]), reverse=True)[:self.top]
+
+    def summary(self):
+        """
+        Returns:
+            summaries (dict) = "module.qualname" -> calls (measured), peak_max, peak_mean, net_mean, net_sum in bytes
+        """
+        with self._lock:
+            return {
+                name: {"calls": calls, "peak_max": peak_max, "peak_mean": peak_sum / calls, "net_mean": net_sum / calls, "net_sum": net_sum}
+                for name, (calls, peak_max, peak_sum, net_sum) in self.stats.items()
+            }
+
+
+def _log_level(record):
+    """Level of a trace record for BoundedStore, failed calls count like errors for the keep_errors policy"""
+    return 1 if "fehler" in record else 3
+
+
+class TraceSwitch:
+    """
+    On/off state of one traced function. `on` already combines the global switch of the profiler with the rules
+    for the function, so a wrapper only checks this one attribute before it runs the plain function.
+    """
+    __slots__ = ("name", "func", "on")
+
+    def __init__(self, name, func, on):
+        self.name = name
+        self.func = func
+        self.on = on
+
+    def __repr__(self):
+        return f"TraceSwitch({self.name}, on={self.on})"
+
+
+class FunctionProfiler:
+    """
+    Traces decorated functions.
+    save    = True/False, Should the trace be streamed into TRACE.jsonl? One JSON object per finished call,\
+              written by a background thread, refer to JsonlSink
+    engine  = "auto", "monitoring" or "settrace". auto takes sys.monitoring on 3.12+ and settrace as fallback\
+    retention = None or dict with the BoundedStore options for self.logs\
+    tail    = None keeps every call, or a TailPolicy/dict of its options: only slow, top n or failing calls keep their record\
+    renderer = ArgRenderer for args, kwargs and results, None = bounded default, ArgRenderer(deferred=True) renders on show\
+    binary  = False, True or a path: also write every call as one compact row into TRACE.pysutrace, refer to BinaryTraceSink\
+    memory  = None, True or dict with the MemoryTracker options: records "speicher" (peak_bytes, net_bytes, top allocation sites) per call\
+    enabled = global switch, can be flipped at runtime with enable()/disable() or a signal (toggle_on_signal).\
+              PYSU_TRACE overrides it at start: "0"/"1", or comma separated patterns like "mymodule.*,other.f" -> only those get traced
+
+    Every log holds its vtrace as compact event tuples (event, perf_counter_ns, name/lineno, payload):
+        ("call", ns, "module.qualname" of the function, None)
+        ("line", ns, line number, ((variable, repr), ...)) -> only the variables changed since the last line
+        ("return", ns, "module.qualname" of the function, repr of return value)
+    Readable strings are only built in format_vtrace, when the logs get shown or saved.
+    """
+    def __init__(self,save, engine="auto", retention=None, tail=None, renderer=None, binary=False, enabled=True, memory=None):
+        self.save = save
+        self._logs = BoundedStore("trace", _log_level, **(retention or {}))
+        self._local = threading.local()
+        self._buffers = [] # (thread, buffer) of every thread that logged, merged into _logs on read
+        self._lock = threading.Lock()
+        self.sink = self._create_sink()
+        self.engine = self._create_engine(engine)
+        self.histograms = {} # "module.qualname" -> LatencyHistogram of every traced function
+        self.tail = TailPolicy(**tail) if isinstance(tail, dict) else tail
+        self.memory = MemoryTracker(**memory) if isinstance(memory, dict) else MemoryTracker() if memory is True else memory or None
+        self.skipped = {} # "module.qualname" -> calls the tail policy didn't keep
+        self.call_trees = {} # "module.qualname" of an entry point -> CallNode, refer to call_tree()
+        self._tree_lock = threading.Lock()
+        self.renderer = renderer or ArgRenderer()
+        self.binary_path = "TRACE.pysutrace" if binary is True else binary or None
+        self.binary = BinaryTraceSink(_trace_path(self.binary_path)) if self.binary_path else None
+        self.enabled = enabled
+        self.rules = [] # (fnmatch pattern, on) per function, the last matching one wins
+        self.switches = [] # TraceSwitch of every decorated function
+        self._switch_lock = threading.RLock() # reentrant, the signal handler may interrupt a switch on the same thread
+        self._read_env()
+        _PROFILERS.add(self)
+
+    def _read_env(self):
+        value = os.environ.get("PYSU_TRACE", "").strip()
+        if not value:
+            return
+        if value.lower() in ("0", "off", "false"):
+            self.enabled = False
+        elif value.lower() in ("1", "on", "true"):
+            self.enabled = True
+        else:
+            self.enabled = True
+            self.rules = [("*", False)] + [(pattern.strip(), True) for pattern in value.split(",") if pattern.strip()]
+
+    def is_enabled(self, name):
+        """True if calls of the function "module.qualname" get traced right now"""
+        if not self.enabled:
+            return False
+        import fnmatch
+        on = True
+        for pattern, rule in self.rules:
+            if fnmatch.fnmatchcase(name, pattern):
+                on = rule
+        return on
+
+    def enable(self, pattern=None):
+        """
+        Turns tracing on while the process runs
+        Args:
+            pattern (str)   = None -> the global switch, else "module.qualname" or a fnmatch pattern like "mymodule.*"
+        """
+        self._switch(pattern, True)
+
+    def disable(self, pattern=None):
+        """Turns tracing off, the decorated functions then only cost one attribute check, refer to enable"""
+        self._switch(pattern, False)
+
+    def _switch(self, pattern, on):
+        with self._switch_lock:
+            if pattern is None:
+                self.enabled = on
+            else:
+                self.rules.append((pattern, on))
+            for switch in self.switches:
+                state = self.is_enabled(switch.name)
+                if state != switch.on:
+                    if state:
+                        self.engine.set_enabled(switch.func, True) # events on before the wrapper starts tracing
+                    switch.on = state
+                    if not state:
+                        self.engine.set_enabled(switch.func, False)
+
+    def toggle_on_signal(self, signum=None):
+        """
+        Flips the global switch whenever the process receives signum, e.g. kill -USR2 <pid>
+        Args:
+            signum (int)    = signal number, default SIGUSR2. Has to be called from the main thread
+        """
+        import signal
+        signum = signal.SIGUSR2 if signum is None else signum
+
+        def handler(received, frame):
+            self._switch(None, not self.enabled)
+        signal.signal(signum, handler)
+
+    def _create_sink(self):
+        """Children of a TraceCollector send their records to it, everyone else streams into a JSONL file"""
+        collector = _collector_sink()
+        if collector is not None:
+            return collector
+        return JsonlSink(_trace_path()) if self.save else None
+
+    def _after_fork(self):
+        self._logs._lock = threading.RLock()
+        self._local = threading.local()
+        self._buffers = []
+        self._lock = threading.Lock()
+        self._switch_lock = threading.RLock()
+        self.sink = self._create_sink()
+        if self.binary is not None:
+            self.binary = BinaryTraceSink(_trace_path(self.binary_path))
+
+    @property
+    def logs(self):
+        """All finished records, the per-thread buffers get merged first"""
+        self._drain()
+        return self._logs
+
+    def _create_engine(self, engine):
+        """Creates the tracing backend, falls back to settrace if sys.monitoring is not usable"""
+        if engine == "auto":
+            engine = "monitoring" if hasattr(sys, "monitoring") else "settrace"
+        if engine not in TRACE_ENGINES:
+            raise Exception(f"Unknown trace engine {engine}, choose from {list(TRACE_ENGINES)}")
+        try:
+            return TRACE_ENGINES[engine]()
+        except RuntimeError as e:
+            import warnings
+            warnings.warn(f"pysu: {e}, falling back to settrace", RuntimeWarning, stacklevel=3)
+            return SettraceEngine()
+
+    def close(self):
+        """
+        Switches tracing off and gives the engine back (the shared sys.monitoring tool id of the process),
+        the decorated functions run untraced afterwards. The records stay readable.
+        """
+        self._switch(None, False)
+        close = getattr(self.engine, "close", None)
+        if close is not None:
+            close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __str__(self):
+        return f"FunctionProfiler(engine={self.engine.name})"
+
+    def trace(self, func=None, *, modules=None, paths=None, lines=None, watch=None):
+        """
+        Wrapper, to observe handed function. Works for functions and async def coroutine functions.
+        Used as @profiler.trace, or with a scope as @profiler.trace(modules=["mypackage"], lines=(10, 20), watch=["total"])
+        Args:
+            func (callable) = The traced function
+            modules/paths   = called code is only traced inside these modules/directories, refer to TraceScope
+            lines (tuple)   = (first, last) or a list of them, only these lines of the function's file get line events
+            watch (list)    = only these variables get captured
+        """
+        if func is None:
+            return lambda func: self.trace(func, modules=modules, paths=paths, lines=lines, watch=watch)
+        import inspect
+        engine = self.engine
+        name = f"{func.__module__}.{func.__qualname__}"
+        scope = None
+        if modules or paths or lines is not None or watch:
+            scope = TraceScope(func, modules, paths, lines, watch)
+        switch = TraceSwitch(name, func, self.is_enabled(name))
+        with self._switch_lock:
+            self.switches.append(switch)
+        engine.register(func)
+        if not switch.on:
+            engine.set_enabled(func, False)
+        renderer = self.renderer
+        try:
+            parameter_info = str(inspect.signature(func)) # once, not per call
+        except (TypeError, ValueError):
+            parameter_info = "(...)"
+        histogram = self.histograms.setdefault(name, LatencyHistogram())
+        filename = func.__code__.co_filename if hasattr(func, "__code__") else "" # as tracemalloc reports it
+
+        def finish(aufruf_zeit, dauer, args, kwargs, ergebnis, vtrace, fehler, extra=None):
+            """Stores the record of a finished call, if the tail policy wants it"""
+            if self.tail is not None and not self.tail.keep(name, dauer, fehler is not None):
+                self.skipped[name] = self.skipped.get(name, 0) + 1
+                return
+            record = {
+                "funktion": func.__name__,
+                "name": name, # "module.qualname", tells equally named methods apart
+                "startzeit": aufruf_zeit,
+                "dauer": dauer,
+                "signatur": parameter_info,
+                "args": renderer.capture_args(args),
+                "kwargs": renderer.capture_kwargs(kwargs),
+                "ergebnis": renderer.capture(ergebnis),
+                "vtrace": vtrace 
+            }
+            if fehler is not None:
+                import traceback
+                record["fehler"] = f"{type(fehler).__name__}: {fehler}"
+                record["traceback"] = "".join(traceback.format_exception(fehler))
+            if extra:
+                record.update(extra)
+            self.add_log(record)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not switch.on:
+                    return await func(*args, **kwargs)
+                start_time = time.time()
+                aufruf_zeit = datetime.now().isoformat()
+                vtrace = []
+                busy = [0, 0, 0]
+                ergebnis, fehler = None, None
+                nested = []
+                nested_token = _NESTED_CALLS.set(nested)
+                memory = self.memory
+                memory_state = memory.begin(name, filename) if memory is not None else None
+                start_ns = time.perf_counter_ns()
+                try:
+                    ergebnis = await _drive_traced(func(*args, **kwargs), engine, engine.begin(func, vtrace, scope), busy)
+                except BaseException as e:
+                    fehler = e
+                    raise
+                finally:
+                    elapsed_ns = time.perf_counter_ns() - start_ns
+                    _NESTED_CALLS.reset(nested_token)
+                    self._add_call_tree(name, start_ns, elapsed_ns, vtrace, nested)
+                    histogram.record(elapsed_ns)
+                    if self.binary is not None:
+                        self.binary.add(name, time.time_ns() - elapsed_ns, elapsed_ns, fehler is not None)
+                    dauer = time.time() - start_time
+                    cpu_dauer = busy[0] / 1e9 # time the coroutine really ran
+                    extra = {
+                        "cpu_dauer": cpu_dauer,
+                        "await_dauer": max(dauer - cpu_dauer, 0.0), # the rest it waited in awaits
+                        "thread_cpu_dauer": busy[1] / 1e9,
+                        "process_cpu_dauer": busy[2] / 1e9,
+                    }
+                    if memory_state is not None:
+                        extra["speicher"] = memory.end(name, memory_state)
+                    finish(aufruf_zeit, dauer, args, kwargs, ergebnis, vtrace, fehler, extra)
+                return ergebnis
+
+            async_wrapper.trace_switch = switch
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not switch.on:
+                return func(*args, **kwargs)
+            outer = engine.pause()
+            try:
+                start_time = time.time()
+                aufruf_zeit = datetime.now().isoformat()
+                vtrace = []
+                ergebnis, fehler = None, None
+                nested = []
+                nested_token = _NESTED_CALLS.set(nested)
+                memory = self.memory
+                memory_state = memory.begin(name, filename) if memory is not None else None
+                thread_ns, process_ns = time.thread_time_ns(), time.process_time_ns()
+                start_ns = time.perf_counter_ns()
+                try:
+                    ergebnis = engine.run(func, vtrace, args, kwargs, scope)
+                except BaseException as e:
+                    fehler = e
+                    raise
+                finally:
+                    elapsed_ns = time.perf_counter_ns() - start_ns
+                    _NESTED_CALLS.reset(nested_token)
+                    self._add_call_tree(name, start_ns, elapsed_ns, vtrace, nested)
+                    histogram.record(elapsed_ns)
+                    if self.binary is not None:
+                        self.binary.add(name, time.time_ns() - elapsed_ns, elapsed_ns, fehler is not None)
+                    extra = {
+                        "thread_cpu_dauer": (time.thread_time_ns() - thread_ns) / 1e9,
+                        "process_cpu_dauer": (time.process_time_ns() - process_ns) / 1e9,
+                    }
+                    if memory_state is not None:
+                        extra["speicher"] = memory.end(name, memory_state)
+                    dauer = time.time() - start_time
+                    finish(aufruf_zeit, dauer, args, kwargs, ergebnis, vtrace, fehler, extra)
+                return ergebnis
+            finally:
+                engine.resume(outer)
+
+        wrapper.trace_switch = switch
+        return wrapper
+
+    DRAIN_EVERY = 64 # records a thread buffers before it merges them itself
+
+    def _add_call_tree(self, name, start_ns, elapsed_ns, vtrace, nested):
+        """Hands the tree of a finished call to the traced call around it, or merges it into the entry point tree"""
+        node = CallNode.from_events(name, start_ns, start_ns + elapsed_ns, vtrace, nested)
+        outer = _NESTED_CALLS.get()
+        if outer is not None:
+            outer.append((start_ns, node))
+            return
+        with self._tree_lock:
+            tree = self.call_trees.get(name)
+            if tree is None:
+                self.call_trees[name] = node
+            else:
+                tree.merge(node)
+
+    def call_tree(self, name=None):
+        """
+        Returns the runtime call trees of the traced entry points (traced calls not made inside another traced call)
+        Args:
+            name (str)      = "module.qualname" of one entry point, None = all
+        Returns:
+            trees (dict)    = name -> JSON-ready tree with calls, inclusive_ns, exclusive_ns and children per node
+        """
+        with self._tree_lock:
+            trees = {key: tree.to_dict() for key, tree in self.call_trees.items() if name is None or key == name}
+        return trees
+
+    def folded_stacks(self, path=None):
+        """
+        Exports all call trees as folded stacks (one "a;b;c exclusive_ns" line per path), e.g. for flamegraph.pl
+        Args:
+            path (str)      = file to write, None = only return the text
+        Returns:
+            text (str)
+        """
+        with self._tree_lock:
+            lines = [line for tree in self.call_trees.values() for line in tree.folded()]
+        text = "\n".join(lines) + "\n" if lines else ""
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        return text
+
+    def add_log(self, record):
+        """Stores a finished record in the buffer of the calling thread and hands it to the sink"""
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = []
+            with self._lock:
+                self._buffers.append((threading.current_thread(), buffer))
+        buffer.append((time.perf_counter_ns(), record))
+        if self.sink is not None:
+            self.sink.put(record)
+        if len(buffer) >= self.DRAIN_EVERY:
+            self._drain()
+
+    def _drain(self):
+        """Moves the records of all thread buffers into the store, ordered by the time they finished"""
+        with self._lock:
+            pending = []
+            alive = []
+            for thread, buffer in self._buffers:
+                n = len(buffer)
+                if n:
+                    pending.append(buffer[:n])
+                    del buffer[:n] # only the owner appends, at the end, so the first n stay the same
+                if thread.is_alive() or buffer:
+                    alive.append((thread, buffer))
+            self._buffers = alive
+            for _, record in heapq.merge(*pending, key=lambda entry: entry[0]):
+                self._logs.append(record)
+
+    def latency(self, reset=False):
+        """
+        Returns the latency summary (count, sum, min, max, mean, p50, p90, p99, p999 in ns) of every traced function
+        Args:
+            reset (bool)    = start a new interval, the next call only reports calls made after this one
+        Returns:
+            summaries (dict) = "module.qualname" -> summary
+        """
+        return {name: histogram.snapshot(reset).summary() for name, histogram in self.histograms.items()}
+
+    def memory_usage(self):
+        """
+        Returns the memory aggregates of the memory mode (memory=True), {} when it is off
+        Returns:
+            summaries (dict) = "module.qualname" -> calls (measured), peak_max, peak_mean, net_mean, net_sum in bytes
+        """
+        return self.memory.summary() if self.memory is not None else {}
+
+    def latency_snapshot(self, reset=False):
+        """Like latency(), but returns mergeable LatencyHistogram copies, e.g. to combine intervals or processes"""
+        return {name: histogram.snapshot(reset) for name, histogram in self.histograms.items()}
+
+    def sample(self, rate=100, top=50):
+        """
+        Creates a SamplingProfiler whose result lands in self.logs, the cheap alternative to trace for production
+        Args:
+            rate (int)  = samples per second
+            top (int)   = how many functions/lines get reported
+        Returns:
+            sampler (SamplingProfiler) = use as context manager or with start()/stop()
+        """
+        return SamplingProfiler(rate, profiler=self, top=top)
+
+    @staticmethod
+    def format_event(event, start_ns):
+        """
+        Turns one vtrace tuple into the readable trace line
+        Args:
+            event (tuple)  = (event, perf_counter_ns, name/lineno, payload)
+            start_ns (int) = timestamp of the first event, the offset gets shown
+        Returns:
+            line (str)     = readable trace line
+        """
+        kind, ts, where, payload = event
+        offset = f"(+{(ts - start_ns) / 1e6:.3f} ms)"
+        if kind == "call":
+            return f"[TRACE] Stepping into: {where} {offset}"
+        if kind == "line":
+            changes = ", ".join(f"'{name}': {wert}" for name, wert in payload)
+            return f"[TRACE] Methods variables value change. {where}: {{{changes}}} {offset}"
+        if kind == "return":
+            return f"[TRACE] Step out of function: {where} with return: {payload} {offset}"
+        return str(event)
+
+    def format_vtrace(self, data):
+        """
+        Builds the readable vtrace of a log, the header and footer lines come from the log fields
+        Args:
+            data (dict)   = one entry of self.logs
+        Returns:
+            lines (list)  = readable trace lines
+        """
+        lines = [
+            f"[PROFILER] Test of method: {data['funktion']}",
+            f"[PROFILER] Starttime: {data['startzeit']}",
+            f"[PROFILER] Parameter-signature: {data.get('signatur', '')}",
+            f"[PROFILER] Used parameters: args={data['args']}, kwargs={data['kwargs']}",
+        ]
+        events = data.get("vtrace", [])
+        if events:
+            start_ns = events[0][1]
+            lines.extend(self.format_event(event, start_ns) for event in events)
+        lines.append(f"[PROFILER] Execution time: {data['dauer']:.4f} seconds")
+        if 'speicher' in data:
+            lines.append(f"[PROFILER] Memory: peak {data['speicher']['peak_bytes']} bytes, net {data['speicher']['net_bytes']} bytes")
+        if 'fehler' in data:
+            lines.append(f"[PROFILER] Raised: {data['fehler']}")
+        else:
+            lines.append(f"[PROFILER] Result: {data['ergebnis']}")
+        return lines
+
+    def print_pretty_function_profile(self,data):
+        def format_trace(trace):
+            return '\n  '.join(trace)
+
+        # Formatierte Ausgabe
+        output = f"Function Profile:\n"
+        output += f"Function: {data['funktion']}\n"
+        output += f"Start Time: {data['startzeit']}\n"
+        output += f"Duration: {data['dauer']} seconds\n"
+        if 'cpu_dauer' in data:
+            output += f"Running: {data['cpu_dauer']} seconds, Awaiting: {data['await_dauer']} seconds\n"
+        if 'thread_cpu_dauer' in data:
+            output += f"CPU: {data['thread_cpu_dauer']} seconds (thread), {data['process_cpu_dauer']} seconds (process)\n"
+        if 'speicher' in data:
+            speicher = data['speicher']
+            output += f"Memory: peak {speicher['peak_bytes']} bytes, net {speicher['net_bytes']} bytes\n"
+            for site in speicher.get('top', []):
+                output += f"  {site['size_diff']:+} bytes ({site['count_diff']:+} blocks) {site['site']}\n"
+        output += f"Arguments: {data['args']}\n"
+        output += f"Keyword Arguments: {json.dumps(data['kwargs'], indent=4, default=str)}\n"
+        output += f"Result: {data['ergebnis']}\n"
+        if 'fehler' in data:
+            output += f"Error: {data['fehler']}\n{data['traceback']}"
+        # Formatierte Trace-Ausgabe
+        if 'vtrace' in data:
+            output += f"\nTrace Log:\n"
+            output += format_trace(self.format_vtrace(data))
+
+        print(output)
+        print("***********************************************************************") 
+
+    def print_pretty_sampling_profile(self, data):
+        output = f"Sampling Profile:\n"
+        output += f"Start Time: {data['startzeit']}\n"
+        output += f"Duration: {data['dauer']} seconds\n"
+        output += f"Samples: {data['samples']} at {data['rate']} Hz\n"
+        output += f"\nHottest functions (self% total%):\n  "
+        output += "\n  ".join(f"{f['self_pct']:6.2f} {f['total_pct']:6.2f}  {f['name']}" for f in data["functions"])
+        output += f"\n\nHottest lines (%):\n  "
+        output += "\n  ".join(f"{l['pct']:6.2f}  {l['line']}" for l in data["lines"])
+        print(output)
+        print("***********************************************************************") 
+
+    def print_latency(self):
+        """Prints the latency distribution of every traced function in ms"""
+        def ms(ns):
+            return "-" if ns is None else f"{ns / 1e6:.3f}"
+
+        print("[LATENCY] count mean p50 p90 p99 p999 max (ms)")
+        for name, summary in self.latency().items():
+            values = " ".join(ms(summary[key]) for key in ("mean", "p50", "p90", "p99", "p999", "max"))
+            print(f"{name}: {summary['count']} {values}")
+        print("***********************************************************************") 
+
+    def show_logs(self):
+        """Shows all saved logs, the trace file gets streamed by the sink so it is only flushed here"""
+        if(self.logs):
+            print("[TRACE LOGS]")
+            if(self.sink is not None):
+                self.sink.flush()
+            if(self.binary is not None):
+                self.binary.flush()
+            for log in self.logs:
+                if("samples" in log):
+                    self.print_pretty_sampling_profile(log)
+                else:
+                    self.print_pretty_function_profile(log)
+            self.print_latency()
+
+class TraceCollector:
+    """
+    Collects the trace records and messages of child processes (multiprocessing, ProcessPoolExecutor, subprocess)
+    into one timeline and one set of latency statistics. start() announces the listener in PYSU_COLLECTOR and
+    PYSU_COLLECTOR_KEY, every pysu/FunctionProfiler created in a child (or inherited by fork) then sends through a
+    CollectorSink instead of keeping its records in its own memory. Start it before the workers get created.
+    address   = listener address, None = a fresh unix socket/named pipe, ("127.0.0.1", 0) for TCP\
+    retention = None or dict with the BoundedStore options for the collected records and messages
+    """
+    def __init__(self, address=None, retention=None):
+        self.address = address
+        self.authkey = os.urandom(16)
+        self.records = BoundedStore("collected", _log_level, **(retention or {}))
+        self.messages = BoundedStore("collected_messages", lambda message: message["mID"], **(retention or {}))
+        self.histograms = {} # "module.qualname" -> LatencyHistogram over all processes
+        self.processes = {} # pid -> {"traces": n, "messages": n, "errors": n}
+        self._lock = threading.Lock()
+        self._listener = None
+        self._thread = None
+        self._connections = []
+
+    def __str__(self):
+        return f"TraceCollector(address={self.address}, processes={len(self.processes)}, records={len(self.records)})"
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        from multiprocessing.connection import Listener
+        self._listener = Listener(self.address, authkey=self.authkey)
+        address = self._listener.address
+        self.address = f"{address[0]}:{address[1]}" if isinstance(address, tuple) else address
+        os.environ["PYSU_COLLECTOR"] = self.address
+        os.environ["PYSU_COLLECTOR_KEY"] = self.authkey.hex()
+        self._thread = threading.Thread(target=self._accept, args=(self._listener,), name="pysu-collector", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        """Stops listening, waits up to timeout seconds for the connected children to send their last records"""
+        if self._listener is None:
+            return
+        if os.environ.get("PYSU_COLLECTOR") == self.address:
+            del os.environ["PYSU_COLLECTOR"], os.environ["PYSU_COLLECTOR_KEY"]
+        listener, self._listener = self._listener, None
+        try:
+            from multiprocessing.connection import Client
+            Client(listener.address, authkey=self.authkey).close() # wakes up the blocking accept()
+        except OSError:
+            pass
+        self._thread.join(timeout)
+        deadline = time.monotonic() + timeout
+        for thread in list(self._connections):
+            thread.join(max(0.0, deadline - time.monotonic()))
+        listener.close()
+
+    def _accept(self, listener):
+        while self._listener is not None:
+            try:
+                conn = listener.accept()
+            except (OSError, EOFError):
+                continue # failed handshake, or the listener got closed
+            if self._listener is None:
+                conn.close()
+                break
+            thread = threading.Thread(target=self._receive, args=(conn,), name="pysu-collector-conn", daemon=True)
+            self._connections.append(thread)
+            thread.start()
+
+    def _receive(self, conn):
+        with conn:
+            while True:
+                try:
+                    data = conn.recv_bytes()
+                except (EOFError, OSError):
+                    break
+                for line in data.decode("utf-8").splitlines():
+                    self.ingest(json.loads(line))
+
+    def ingest(self, envelope):
+        """Merges one {"kind", "pid", "record"} envelope of a CollectorSink"""
+        pid = envelope["pid"]
+        record = envelope["record"]
+        record["pid"] = pid
+        with self._lock:
+            stats = self.processes.get(pid)
+            if stats is None:
+                stats = self.processes[pid] = {"traces": 0, "messages": 0, "errors": 0}
+            if envelope["kind"] == "message":
+                stats["messages"] += 1
+                self.messages.append(record)
+                return
+            stats["traces"] += 1
+            if "fehler" in record:
+                stats["errors"] += 1
+            self.records.append(record)
+            if "dauer" in record and "funktion" in record:
+                name = record.get("name", record["funktion"]) # records of older versions only have the bare name
+                histogram = self.histograms.get(name)
+                if histogram is None:
+                    histogram = self.histograms[name] = LatencyHistogram()
+                histogram.record(int(record["dauer"] * 1e9))
+
+    def timeline(self):
+        """Trace records and messages of all processes in one list, ordered by start time"""
+        def start(item):
+            if "ts" in item:
+                return item["ts"]
+            return datetime.fromisoformat(item["startzeit"]).timestamp() if "startzeit" in item else 0.0
+        with self._lock:
+            items = list(self.records) + list(self.messages)
+        return sorted(items, key=start)
+
+    def latency(self):
+        """Latency summary of every traced function over all processes, refer to FunctionProfiler.latency"""
+        with self._lock:
+            return {name: histogram.summary() for name, histogram in self.histograms.items()}
+
+    def stats(self):
+        """Per process counters: pid -> traces, messages, errors"""
+        with self._lock:
+            return {pid: dict(stats) for pid, stats in self.processes.items()}
+
+
+def resolve_module(name, search_paths=None):
+    """
+    Finds the source file of a dotted module name without importing it
+    Args:
+        name (str)          = dotted module name, e.g. "package.module"
+        search_paths (list) = directories to search, None = sys.path
+    Returns:
+        path (str)          = path to the .py file or the package __init__.py, None if not found
+    """
+    parts = name.split(".")
+    for base in (sys.path if search_paths is None else search_paths):
+        candidate = os.path.join(base or os.getcwd(), *parts)
+        for path in (candidate + ".py", os.path.join(candidate, "__init__.py")):
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+def merge_structs(structs):
+    """
+    Merges any number of PyClassScanner results in one pass. Classes and callers get deduplicated by their
+    qualified name (falls back to the bare name), callees of the same caller by their name.
+    Args:
+        structs (iterable)  = returns from PyClassScanner
+    Returns:
+        merged (dict)       = {"Classes": [...], "CallHierarchy": [...]}
+    """
+    classes = {}
+    calls = {} # qualname -> (first entry, callees)
+    for struct in structs:
+        for cls in struct.get("Classes", []):
+            classes.setdefault(cls.get("qualname", cls["name"]), cls)
+        for call in struct.get("CallHierarchy", []):
+            _, callees = calls.setdefault(call.get("qualname", call["name"]), (call, {}))
+            for callee in call.get("callees", []):
+                callees.setdefault(callee["name"], callee)
+    return {
+        "Classes": list(classes.values()),
+        "CallHierarchy": [dict(call, callees=list(callees.values())) for call, callees in calls.values()],
+    }
+
+
+class CallGraph:
+    """
+    Call graph keyed by fully qualified names ("module.Class.method", "module.function"), built from the Symbols
+    of PyClassScanner results. Calls get resolved best effort: local definitions, imports (also relative ones and
+    re-exports of scanned packages), self./cls. receivers along the base classes, super() and constructors
+    (Class() -> Class.__init__). Forward and reverse adjacency are kept as sets, so callers/callees are lookups
+    and reachable_from/reaching are one linear walk.
+    forward     = caller -> set of callees\
+    reverse     = callee -> set of callers\
+    unresolved  = caller -> call expressions nobody could resolve (builtins, attributes of unknown objects)\
+    external    = resolved through an import, but not defined in the scanned code (e.g. "os.path.join")
+    """
+    MAX_HOPS = 8 # re-export chains that get followed
+
+    def __init__(self):
+        self.modules = {} # module -> (symbols, is package)
+        self.defs = {} # qualified name -> "class"/"function"
+        self.def_modules = {} # qualified name -> module it is defined in
+        self.bases = {} # qualified class -> qualified base classes that were found
+        self.forward = {}
+        self.reverse = {}
+        self.unresolved = {}
+        self.external = set()
+
+    def __str__(self):
+        edges = sum(len(callees) for callees in self.forward.values())
+        return f"CallGraph(modules={len(self.modules)}, definitions={len(self.defs)}, edges={edges})"
+
+    def __contains__(self, name):
+        return name in self.defs or name in self.external
+
+    @classmethod
+    def from_results(cls, results):
+        """
+        Builds the graph from scan results
+        Args:
+            results (dict)  = path -> PyClassScanner result, the module names come from the package structure
+        Returns:
+            graph (CallGraph)
+        """
+        graph = cls()
+        for path, result in results.items():
+            if "Symbols" in result:
+                graph.add_module(ProjectScanner.module_name(path), result["Symbols"], os.path.basename(path) == "__init__.py")
+        return graph.build()
+
+    def add_module(self, module, symbols, package=False):
+        """Adds the Symbols of one scanned file, build() resolves them"""
+        self.modules[module] = (symbols, package)
+
+    @staticmethod
+    def _qualify(module, name):
+        return f"{module}.{name}" if module and name else module or name
+
+    def _absolute(self, module, target):
+        """Resolves a relative import target against the module it got imported in"""
+        if not target.startswith("."):
+            return target
+        level = len(target) - len(target.lstrip("."))
+        parts = module.split(".") if self.modules.get(module, (None, False))[1] else module.split(".")[:-1]
+        parts = parts[:len(parts) - (level - 1)] if level > 1 else parts
+        rest = target[level:]
+        return ".".join(parts + ([rest] if rest else []))
+
+    def _follow(self, name):
+        """Follows re-exports (from .impl import f in a scanned module) until name is a definition"""
+        for _ in range(self.MAX_HOPS):
+            if name in self.defs:
+                return name
+            parts = name.split(".")
+            for i in range(len(parts) - 1, 0, -1):
+                module = ".".join(parts[:i])
+                if module in self.modules:
+                    imports = self.modules[module][0].get("imports", {})
+                    if parts[i] in imports:
+                        name = ".".join([self._absolute(module, imports[parts[i]])] + parts[i + 1:])
+                        break
+                    return name
+            else:
+                return name
+        return name
+
+    def _resolve_name(self, module, caller, dotted):
+        """Qualified name a dotted expression refers to, None if it isn't a local definition or an import"""
+        head, _, rest = dotted.partition(".")
+        if head in ("?", "super()", "self", "cls"):
+            return None
+        symbols = self.modules[module][0]
+        scope = caller
+        while scope: # definitions of enclosing functions first
+            local = self._qualify(module, f"{scope}.<locals>.{head}")
+            if local in self.defs:
+                return f"{local}.{rest}" if rest else local
+            scope = scope.rpartition(".<locals>")[0] if ".<locals>" in scope else ""
+        if self._qualify(module, head) in self.defs:
+            base = self._qualify(module, head)
+        elif head in symbols.get("imports", {}):
+            base = self._absolute(module, symbols["imports"][head])
+        else:
+            return None
+        return self._follow(f"{base}.{rest}" if rest else base)
+
+    def _mro(self, cls):
+        """cls and its scanned base classes, breadth first"""
+        order, todo = [], [cls]
+        while todo:
+            current = todo.pop(0)
+            if current not in order:
+                order.append(current)
+                todo.extend(self.bases.get(current, ()))
+        return order
+
+    def _lookup(self, cls, attr, skip_self=False):
+        """Finds attr on cls or its (scanned) base classes"""
+        for current in self._mro(cls):
+            if not (skip_self and current == cls) and f"{current}.{attr}" in self.defs:
+                return f"{current}.{attr}"
+        return None
+
+    def _own_class(self, module, caller):
+        """Qualified class a method (or a function nested in it) belongs to, None for plain functions"""
+        cls = caller.split(".<locals>")[0].rpartition(".")[0]
+        cls = self._qualify(module, cls) if cls else None
+        return cls if self.defs.get(cls) == "class" else None
+
+    def _receiver_class(self, module, caller, receiver):
+        """Qualified class of a receiver ("Engine()", a local e = Engine(), self.e = Engine()), None if unknown"""
+        if receiver.endswith("()"):
+            cls = self._resolve_name(module, caller, receiver[:-2])
+            return cls if self.defs.get(cls) == "class" else None
+        if receiver.startswith("self."):
+            attr = receiver[len("self."):]
+            cls = self._own_class(module, caller)
+            if "." in attr or cls is None:
+                return None
+            for owner in self._mro(cls): # self.e may be set in a base class, resolved where it got assigned
+                owner_module = self.def_modules[owner]
+                relative = owner[len(owner_module) + 1:] if owner_module else owner
+                instance = self.modules[owner_module][0].get("assigns", {}).get(relative, {}).get(receiver)
+                if instance is not None:
+                    return self._receiver_class(owner_module, "", instance)
+            return None
+        assigns = self.modules[module][0].get("assigns", {})
+        instance = assigns.get(caller, {}).get(receiver) or assigns.get("", {}).get(receiver) # local, else global
+        return self._receiver_class(module, caller, instance) if instance is not None else None
+
+    def _resolve_call(self, module, caller, expr):
+        receiver, _, attr = expr.rpartition(".")
+        if receiver in ("self", "cls", "super()"):
+            cls = self._own_class(module, caller)
+            return self._lookup(cls, attr, skip_self=receiver == "super()") if cls is not None else None
+        if receiver:
+            cls = self._receiver_class(module, caller, receiver)
+            if cls is not None:
+                return self._lookup(cls, attr)
+            if receiver.startswith(("self.", "cls.", "super().", "?")) or "()" in receiver:
+                return None # attribute of an object of unknown type
+        name = self._resolve_name(module, caller, expr)
+        if name is None:
+            return None
+        kind = self.defs.get(name)
+        if kind == "class":
+            return self._lookup(name, "__init__") or name
+        if kind is None:
+            owner, _, attr = name.rpartition(".")
+            if self.defs.get(owner) == "class": # Class.method inherited from a base
+                return self._lookup(owner, attr)
+            if self._qualify(module, expr.partition(".")[0]) in self.defs:
+                return None # attribute of a local definition that doesn't exist
+            self.external.add(name)
+        return name
+
+    def build(self):
+        """Resolves all calls of the added modules, can be called again after add_module"""
+        self.defs, self.def_modules = {}, {}
+        self.forward, self.reverse, self.unresolved, self.external = {}, {}, {}, set()
+        for module, (symbols, _) in self.modules.items():
+            for name, kind in symbols.get("defs", {}).items():
+                self.defs[self._qualify(module, name)] = kind
+                self.def_modules[self._qualify(module, name)] = module
+        self.bases = {}
+        for module, (symbols, _) in self.modules.items():
+            for cls, bases in symbols.get("bases", {}).items():
+                resolved = (self._resolve_name(module, "", base) for base in bases)
+                self.bases[self._qualify(module, cls)] = [base for base in resolved if self.defs.get(base) == "class"]
+        for module, (symbols, _) in self.modules.items():
+            for caller, callees in symbols.get("calls", {}).items():
+                source = self._qualify(module, caller)
+                for expr in callees:
+                    target = self._resolve_call(module, caller, expr)
+                    if target is None:
+                        self.unresolved.setdefault(source, []).append(expr)
+                        continue
+                    self.forward.setdefault(source, set()).add(target)
+                    self.reverse.setdefault(target, set()).add(source)
+        return self
+
+    def callees(self, name):
+        """Everything name calls directly"""
+        return sorted(self.forward.get(name, ()))
+
+    def callers(self, name):
+        """Everything that calls name directly"""
+        return sorted(self.reverse.get(name, ()))
+
+    def _walk(self, adjacency, name, max_depth):
+        found = set()
+        level = [name]
+        depth = 0
+        while level and (max_depth is None or depth < max_depth):
+            following = []
+            for node in level:
+                for neighbour in adjacency.get(node, ()):
+                    if neighbour not in found:
+                        found.add(neighbour)
+                        following.append(neighbour)
+            level = following
+            depth += 1
+        return found
+
+    def reachable_from(self, name, max_depth=None):
+        """Everything name can end up calling, directly or indirectly"""
+        return sorted(self._walk(self.forward, name, max_depth))
+
+    def reaching(self, name, max_depth=None):
+        """Everything that can end up calling name, directly or indirectly"""
+        return sorted(self._walk(self.reverse, name, max_depth))
+
+    def to_dict(self):
+        """JSON-ready view: definitions, resolved edges, external targets and unresolved calls"""
+        return {
+            "definitions": self.defs,
+            "calls": {caller: sorted(callees) for caller, callees in self.forward.items()},
+            "external": sorted(self.external),
+            "unresolved": self.unresolved,
+        }
+
+
+def _scan_file(path):
+    """Worker for the process pool of ProjectScanner, never raises so one broken file doesn't stop the scan"""
+    try:
+        return path, PyClassScanner(path).run(), None
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+class ProjectScanner:
+    """
+    Scans a whole package tree with a process pool and merges everything once.
+    root        = package directory or project root\\
+    workers     = number of processes, None = os.cpu_count(), 1 = scan in this process\\
+    cache       = ScanCache or None, cached files never reach the pool\\
+    exclude     = directory names that get skipped, hidden directories are always skipped
+    """
+    EXCLUDE = ("__pycache__", ".pysu_cache", "venv", "build", "dist", "node_modules", "site-packages")
+    PARALLEL_MIN = 32 # below that the pool start costs more than it saves
+
+    def __init__(self, root, workers=None, cache=None, exclude=EXCLUDE):
+        self.root = os.path.abspath(root)
+        self.workers = workers or os.cpu_count() or 1
+        self.cache = cache
+        self.exclude = set(exclude)
+        self.errors = {} # path -> error message
+        self.structs = {}
+        self.results = {} # path -> qualified PyClassScanner result
+
+    def __str__(self):
+        return f"ProjectScanner(root={self.root}, workers={self.workers})"
+
+    def iter_files(self):
+        """Yields all .py files below root"""
+        if os.path.isfile(self.root):
+            yield self.root
+            return
+        for directory, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = sorted(d for d in dirnames if d not in self.exclude and not d.startswith("."))
+            for filename in sorted(filenames):
+                if filename.endswith(".py"):
+                    yield os.path.join(directory, filename)
+
+    @staticmethod
+    def module_name(path):
+        """Dotted module name of a file, derived from the package structure (__init__.py files) above it"""
+        directory, filename = os.path.split(os.path.abspath(path))
+        stem = filename[:-3] if filename.endswith(".py") else filename
+        parts = [] if stem == "__init__" else [stem]
+        while os.path.isfile(os.path.join(directory, "__init__.py")):
+            directory, package = os.path.split(directory)
+            parts.insert(0, package)
+        return ".".join(parts)
+
+    def scan(self, files):
+        """
+        Scans the given files, cached ones are loaded, the rest gets parsed in the process pool
+        Args:
+            files (list)    = paths of .py files
+        Returns:
+            results (dict)  = path -> PyClassScanner result, failed files land in self.errors
+        """
+        results = {}
+        todo = []
+        for path in files:
+            cached = self.cache.load(path) if self.cache is not None else None
+            if cached is not None:
+                results[path] = cached
+            else:
+                todo.append(path)
+
+        if self.workers > 1 and len(todo) >= self.PARALLEL_MIN:
+            from concurrent.futures import ProcessPoolExecutor # imported on use, import pysu should stay cheap
+            with ProcessPoolExecutor(self.workers) as pool:
+                scanned = list(pool.map(_scan_file, todo, chunksize=max(1, len(todo) // (self.workers * 4))))
+        else:
+            scanned = map(_scan_file, todo)
+
+        for path, result, error in scanned:
+            if error is not None:
+                self.errors[path] = error
+                continue
+            results[path] = result
+            if self.cache is not None:
+                self.cache.store(path, result)
+        return results
+
+    @classmethod
+    def qualify(cls, path, result):
+        """Adds module and qualname (module.Class, module.caller) to every class and CallHierarchy entry of a scan result"""
+        module = cls.module_name(path)
+        for entry in result["Classes"]:
+            entry["module"] = module
+            entry["qualname"] = f"{module}.{entry['name']}" if module else entry["name"]
+        for call in result["CallHierarchy"]:
+            call["qualname"] = f"{module}.{call['name']}" if module else call["name"]
+        return result
+
+    def run(self):
+        """WRAPPER scans the tree and returns the merged structs, refer to merge_structs"""
+        results = self.scan(list(self.iter_files()))
+        self.results = {path: self.qualify(path, result) for path, result in results.items()}
+        self.structs = merge_structs(self.results.values())
+        return self.structs
+
+    def call_graph(self):
+        """Symbol-resolved CallGraph of the scanned files, run() has to be called first"""
+        return CallGraph.from_results(self.results)
+
+    def save(self, uml_path="UML.txt", json_path=None):
+        """Writes the merged structs as textual UML and optionally as JSON"""
+        with open(uml_path, "w", encoding="utf-8") as f:
+            f.write(pysu.generate_uml_diagram(self.structs))
+        if json_path:
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(self.structs, f, indent=4)
+
+
+class ProjectWatcher(ProjectScanner):
+    """
+    Keeps the structural view of a package tree up to date. Every file keeps its own index entry,
+    a poll only re-parses files with a new mtime/size and patches the merged classes, call hierarchy and UML.
+    interval    = seconds between two polls in watch()\\
+    uml_path    = rewritten after every change, None = keep it in memory only\\
+    json_path   = same for the merged structs as JSON\\
+    refer ProjectScanner for the other options.
+    """
+    def __init__(self, root, workers=None, cache=None, exclude=ProjectScanner.EXCLUDE, interval=1.0, uml_path=None, json_path=None):
+        super().__init__(root, workers, cache, exclude)
+        self.interval = interval
+        self.uml_path = uml_path
+        self.json_path = json_path
+        self.index = {}     # path -> (mtime_ns, size, qualified result)
+        self.failed = {}    # path -> (mtime_ns, size) of files that didn't parse, retried once they change
+        self.classes = {}   # qualname -> (path, class entry)
+        self.calls = {}     # caller qualname -> {callee: number of files with this call}
+        self.class_uml = {} # qualname -> UML block of the class
+        self.uml = ""
+        self._thread = None
+        self._stop = threading.Event()
+
+    def __str__(self):
+        return f"ProjectWatcher(root={self.root}, files={len(self.index)}, failed={len(self.failed)}, classes={len(self.classes)})"
+
+    def run(self):
+        """Initial full scan, afterwards only poll() is needed"""
+        self.poll()
+        return self.structs
+
+    def poll(self):
+        """
+        Checks all files for changes and applies them
+        Returns:
+            changed (list) = paths that got added, changed or removed
+        """
+        current = {}
+        for path in self.iter_files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            current[path] = (stat.st_mtime_ns, stat.st_size)
+        changed = [path for path, key in current.items() if self.index.get(path, self.failed.get(path, (None, None)))[:2] != key]
+        removed = [path for path in list(self.index) + list(self.failed) if path not in current]
+
+        for path in removed:
+            self._remove(path)
+            self.failed.pop(path, None)
+            self.errors.pop(path, None)
+        results = self.scan(changed)
+        for path in changed:
+            self._remove(path)
+            if path in results:
+                self.errors.pop(path, None)
+                self.failed.pop(path, None)
+                self._add(path, current[path], self.qualify(path, results[path]))
+            else: # self.errors has the reason
+                self.failed[path] = current[path]
+        if changed or removed:
+            self._rebuild()
+        return changed + removed
+
+    def watch(self, callback=None):
+        """Polls every interval seconds until stop() is called, callback(changed) gets called after each change"""
+        self._stop.clear()
+        while not self._stop.is_set():
+            changed = self.poll()
+            if changed and callback is not None:
+                callback(changed)
+            self._stop.wait(self.interval)
+
+    def start(self, callback=None):
+        """Runs watch() in a background thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.watch, args=(callback,), name="pysu-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _add(self, path, key, result):
+        self.index[path] = key + (result,)
+        self.results[path] = result
+        for cls in result["Classes"]:
+            qualname = cls["qualname"]
+            if qualname not in self.classes: # first file wins, like merge_structs
+                self.classes[qualname] = (path, cls)
+                self.class_uml[qualname] = pysu.generate_uml_diagram({"Classes": [cls]})
+        for call in result["CallHierarchy"]:
+            callees = self.calls.setdefault(call["qualname"], {})
+            for callee in dict.fromkeys(callee["name"] for callee in call.get("callees", [])):
+                callees[callee] = callees.get(callee, 0) + 1
+
+    def _remove(self, path):
+        entry = self.index.pop(path, None)
+        if entry is None:
+            return
+        self.results.pop(path, None)
+        result = entry[2]
+        for cls in result["Classes"]:
+            qualname = cls["qualname"]
+            if self.classes.get(qualname, (None,))[0] == path:
+                del self.classes[qualname]
+                del self.class_uml[qualname]
+        for call in result["CallHierarchy"]:
+            callees = self.calls.get(call["qualname"], {})
+            for callee in dict.fromkeys(callee["name"] for callee in call.get("callees", [])):
+                callees[callee] -= 1
+                if not callees[callee]:
+                    del callees[callee]
+            if not callees:
+                self.calls.pop(call["qualname"], None)
+
+    def _rebuild(self):
+        """Builds the merged view from the index, only joins the cached parts"""
+        self.structs = {
+            "Classes": [cls for _, cls in self.classes.values()],
+            "CallHierarchy": [
+                {"name": caller.rpartition(".")[2], "qualname": caller, "callees": [{"name": callee} for callee in callees]}
+                for caller, callees in self.calls.items()
+            ],
+        }
+        uml = list(self.class_uml.values())
+        if self.calls:
+            uml.append("Call Hierarchy:")
+            uml.extend(f"    {caller} -> {', '.join(callees)}" for caller, callees in self.calls.items())
+        self.uml = "\n".join(uml)
+        if self.uml_path:
+            with open(self.uml_path, "w", encoding="utf-8") as f:
+                f.write(self.uml)
+        if self.json_path:
+            with open(self.json_path, "w", encoding="utf-8") as f:
+                json.dump(self.structs, f, indent=4)
+
+
+class ScanCache:
+    """
+    Persistent cache for PyClassScanner results, one JSON file per scanned source.
+    An entry is valid for the same path and python version if mtime+size match, or else if the content hash matches.
+    cache_dir = directory for the cache files, None = .pysu_cache next to each scanned source.
+                Can also be set with the env var PYSU_CACHE_DIR, PYSU_NO_CACHE=1 turns the cache off.
+    """
+    VERSION = 2 # bump when the scanner output changes, old entries get ignored then
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or os.environ.get("PYSU_CACHE_DIR")
+        self.hits = 0
+        self.misses = 0
+
+    def __str__(self):
+        return f"ScanCache(cache_dir={self.cache_dir}, hits={self.hits}, misses={self.misses})"
+
+    def _entry_path(self, path):
+        path = os.path.abspath(path)
+        key = hashlib.sha1(f"{path}|{sys.version}".encode("utf-8")).hexdigest()
+        directory = self.cache_dir or os.path.join(os.path.dirname(path), ".pysu_cache")
+        return os.path.join(directory, f"{os.path.basename(path)}.{key[:16]}.json")
+
+    @staticmethod
+    def _hash(path):
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def load(self, path):
+        """
+        Returns the cached scan result of path or None, if there is no valid entry
+        Args:
+            path (str)      = the scanned source file
+        Returns:
+            result (dict)   = same structure as PyClassScanner.run() or None
+        """
+        try:
+            with open(self._entry_path(path), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            stat = os.stat(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        if entry.get("version") != self.VERSION or entry.get("python") != sys.version:
+            self.misses += 1
+            return None
+        if entry["mtime_ns"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+            if entry["sha256"] != self._hash(path): # touched but unchanged files are still valid
+                self.misses += 1
+                return None
+        self.hits += 1
+        return entry["result"]
+
+    def store(self, path, result):
+        """Writes the scan result of path, a failing write only costs the next start a rescan"""
+        entry_path = self._entry_path(path)
+        try:
+            stat = os.stat(path)
+            entry = {
+                "version": self.VERSION,
+                "python": sys.version,
+                "path": os.path.abspath(path),
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "sha256": self._hash(path),
+                "result": result,
+            }
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, entry_path) # atomic, parallel starts never read half written entries
+        except OSError as e:
+            print(f"pysu: scan cache for {path} not written: {e}")
+
+    def invalidate(self, path):
+        """Removes the entry of one source file"""
+        try:
+            os.remove(self._entry_path(path))
+        except FileNotFoundError:
+            pass
+
+
+class PyClassScanner:
+    def __init__(self, input_filename, cache=None):
+        """
+        Takes an filename and parses the classes out of the file
+        Args:
+            filename (path)     = The path to the to scanning file
+            cache (ScanCache)   = Loads/stores the result instead of parsing again, None = always parse
+        """
+        self.input_filename = input_filename
+        self.cache = cache
+        self.classes = {}
+        self.call_hierarchy = {}
+        self.symbols = {}
+        self.ouput_obj = {}
+
+    def __str__(self):
+        return f"PyClassScanner(input_filename={self.input_filename})"
+
+    def _parse_file(self):
+        """Parses the input Python file and extracts class definitions."""
+        import ast # imported on use, import pysu should stay cheap
+        with open(self.input_filename, "r", encoding="utf-8", errors="ignore") as file:
+            tree = ast.parse(file.read(), filename=self.input_filename)
+
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ClassDef):
+                methods = self._extract_methods(node)
+                self.classes[node.name] = methods
+        self.symbols = self._collect_symbols(tree)
+
+    def _collect_symbols(self, tree):
+        """
+        Collects what CallGraph needs to resolve calls across modules, still unresolved so the result can be cached:
+            imports = local name -> imported dotted name (relative ones keep their leading dots)
+            defs    = qualname in the module -> "class"/"function"
+            bases   = class qualname -> dotted base class expressions
+            calls   = caller qualname ("" = module level) -> dotted callee expressions like "helper", "self.run",
+                      "os.path.join", "super().setup", "Engine().start", "?.run" (receiver not a plain name)
+            assigns = function qualname ("" = module) -> {name: "Engine()"}, class qualname -> {"self.attr": "Engine()"},
+                      the instances created by simple assignments, so their method calls can be resolved
+        """
+        import ast
+        imports, defs, bases, calls, assigns = {}, {}, {}, {}, {}
+
+        def dotted(expr):
+            parts = []
+            while isinstance(expr, ast.Attribute):
+                parts.append(expr.attr)
+                expr = expr.value
+            if isinstance(expr, ast.Name):
+                parts.append(expr.id)
+            elif isinstance(expr, ast.Call):
+                parts.append(dotted(expr.func) + "()")
+            else:
+                parts.append("?")
+            return ".".join(reversed(parts))
+
+        def visit(node, scope, caller, in_function):
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                    for expr in child.decorator_list: # decorators run in the enclosing scope
+                        visit(expr, scope, caller, in_function)
+                    qualname = f"{scope}.{child.name}" if scope else child.name
+                    if isinstance(child, ast.ClassDef):
+                        defs[qualname] = "class"
+                        bases[qualname] = [dotted(base) for base in child.bases]
+                        visit(child, qualname, caller, in_function)
+                    else:
+                        defs[qualname] = "function"
+                        visit(child, f"{qualname}.<locals>", qualname, True)
+                    continue
+                if isinstance(child, ast.Import):
+                    for alias in child.names:
+                        imports[alias.asname or alias.name.split(".")[0]] = alias.name if alias.asname else alias.name.split(".")[0]
+                elif isinstance(child, ast.ImportFrom):
+                    module = "." * child.level + (child.module or "")
+                    for alias in child.names:
+                        if alias.name != "*":
+                            imports[alias.asname or alias.name] = f"{module}.{alias.name}" if child.module else f"{module}{alias.name}"
+                elif isinstance(child, ast.Call):
+                    callee = dotted(child.func)
+                    if callee != "super": # part of super().method
+                        calls.setdefault(caller, {})[callee] = None
+                elif (in_function or not scope) and isinstance(child, ast.Assign) and isinstance(child.value, ast.Call):
+                    instance = dotted(child.value.func) + "()"
+                    for target in child.targets:
+                        if isinstance(target, ast.Name):
+                            assigns.setdefault(caller, {})[target.id] = instance
+                        elif isinstance(target, ast.Attribute) and isinstance(target.value, ast.Name) and target.value.id == "self":
+                            cls = caller.split(".<locals>")[0].rpartition(".")[0]
+                            if defs.get(cls) == "class":
+                                assigns.setdefault(cls, {})[f"self.{target.attr}"] = instance
+                visit(child, scope, caller, in_function)
+
+        visit(tree, "", "", False)
+        return {
+            "imports": imports,
+            "defs": defs,
+            "bases": bases,
+            "calls": {caller: list(callees) for caller, callees in calls.items()},
+            "assigns": assigns,
+        }
+
+    def _extract_methods(self, class_node):
+        """
+        Extracts methods and their parameters from a class node.
+        Args:
+            class_node (Any) = The scanned class nodes
+        """
+        import ast
+        methods = {}
+        for item in class_node.body:
+            if isinstance(item, ast.FunctionDef):
+                method_name = item.name
+                parameters = [arg.arg for arg in item.args.args]
+                docstring = ast.get_docstring(item)  # Get the docstring of the method
+                methods[method_name] = {
+                    "parameters": parameters,
+                    "docstring": docstring,
+                }
+                self._track_calls(item)
+        return methods
+
+    def _track_calls(self, method_node):
+        """
+        Tracks method calls inside the method body from method nodes.
+        Args:
+            method_node (Any) = The scanned method nodes
+        """
+        import ast
+        for node in ast.walk(method_node):
+            if isinstance(node, ast.Call):
+                if isinstance(node.func, ast.Attribute):
+                    caller = method_node.name
+                    callee = node.func.attr
+                    if caller not in self.call_hierarchy:
+                        self.call_hierarchy[caller] = []
+                    self.call_hierarchy[caller].append(callee)
+
+    def _measure_execution_time(self, method_node):
+        """
+        Measures the execution time of the given method.
+        Args:
+            method_node (Any) = The scanned method nodes
+        """
+        start_time = time.time()
+        exec(compile(method_node, filename="<ast>", mode="exec"))# Execute the method standalone
+        end_time = time.time()
+        return end_time - start_time
+
+    def _generate_json(self):
+        """Generates a JSON representation of the class structure and call hierarchy."""
+        diagram = {"Classes": []}
+        for class_name, methods in self.classes.items():
+            class_elem = {"name": class_name, "methods": []}
+            for method_name, method_info in methods.items():
+                method_elem = {
+                    "name": method_name,
+                    "parameters": [
+                        {"name": param} for param in method_info["parameters"]
+                    ],
+                    "docstring": method_info["docstring"]
+                    or "",  # Include docstring if it exists
+                }
+                class_elem["methods"].append(method_elem)
+            diagram["Classes"].append(class_elem)
+        diagram["CallHierarchy"] = []
+        for caller, callees in self.call_hierarchy.items():
+            caller_elem = {
+                "name": caller,
+                "callees": [{"name": callee} for callee in callees],
+            }
+            diagram["CallHierarchy"].append(caller_elem)
+        diagram["Symbols"] = self.symbols
+        return diagram
+
+    def run(self):
+        """WRAPPER Main function to generate the JSON diagram."""
+        if not os.path.isfile(self.input_filename):
+            raise FileNotFoundError(f"File {self.input_filename} not found.")
+
+        if self.cache is not None:
+            cached = self.cache.load(self.input_filename)
+            if cached is not None:
+                self.ouput_obj = cached
+                return cached
+
+        self._parse_file()
+        json_output = self._generate_json()
+        self.ouput_obj = json_output
+        if self.cache is not None:
+            self.cache.store(self.input_filename, json_output)
+        return json_output
+
+
+def main(argv=None):
+    """
+    python -m pysu analyze TRACE.jsonl [..] / python -m pysu compare OLD NEW, prints JSON.
+    compare exits with 1 if a function regressed, so it can gate a CI job, both exit with 2 on unreadable input
+    """
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m pysu", description="Analyzes pysu trace files, prints the results as JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+    analyze = commands.add_parser("analyze", help="per function statistics and slowest calls of one run")
+    analyze.add_argument("paths", nargs="+", help="TRACE.jsonl/TRACE.json/.pysutrace files or directories with them")
+    analyze.add_argument("--top", type=int, default=10, help="slowest calls per function")
+    analyze.add_argument("--function", help="only functions matching this fnmatch pattern")
+    analyze.add_argument("--output", help="also write the report into this file")
+    compare = commands.add_parser("compare", help="flags functions whose percentiles got slower between two runs")
+    compare.add_argument("baseline", help="trace file/directory or analyze report (.json with 'functions') of the older run")
+    compare.add_argument("current", help="the same for the newer run")
+    compare.add_argument("--threshold", type=float, default=0.1, help="relative slowdown that counts as regression")
+    compare.add_argument("--metrics", nargs="+", default=["p50", "p99"], help="compared statistics")
+    compare.add_argument("--min-count", type=int, default=1, help="ignore functions with fewer calls")
+    compare.add_argument("--function", help="only functions matching this fnmatch pattern")
+    compare.add_argument("--output", help="also write the comparison into this file")
+    args = parser.parse_args(argv)
+
+    def load(paths):
+        if len(paths) == 1 and paths[0].endswith(".json") and os.path.isfile(paths[0]):
+            try:
+                with open(paths[0], encoding="utf-8") as f:
+                    report = json.load(f)
+                if isinstance(report, dict) and "functions" in report: # report of an earlier analyze
+                    return report
+            except ValueError:
+                pass
+        analyzer = TraceAnalyzer(top=getattr(args, "top", 0))
+        for path in paths:
+            analyzer.add(path)
+        return analyzer.report(args.function)
+
+    try:
+        if args.command == "analyze":
+            result = load(args.paths)
+            status = 0
+        else:
+            result = compare_traces(load([args.baseline]), load([args.current]), args.threshold, args.metrics, args.min_count)
+            status = 1 if result["regressions"] else 0
+    except (OSError, ValueError) as e:
+        print(f"pysu: {e}", file=sys.stderr)
+        return 2
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=4)
+    print(json.dumps(result, indent=4))
+    return status
 
 
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+"""
+AUTHOR:         YemotaY
+Titel:          pysu visualization
+Beschreibung:   visualization stack of pysu, kept apart so `import pysu` stays cheap.
+                numpy and networkx get loaded when this module is imported, matplotlib only for the interactive window.
+Lizenz:         open source of course
+"""
+
+# IMPORTS
+import os
+import html
+import numpy as np
+import networkx as nx
+
+
+class MonitorVisualizer:
+    """
+    Class -> method -> parameter graph of the scanned classes, renders headless to SVG/HTML or into a matplotlib window.
+    Node ids are qualified ("module.Class", "module.Class.method", "module.Class.method:param"), so equally named
+    methods of different classes stay apart, the bare name is kept as label.
+    classes_structs = return of PyClassScanner/merge_structs
+    """
+    COLORS = {"class": "skyblue", "method": "lightgreen", "parameter": "lightcoral"}
+    RADIUS = {"class": 18, "method": 10, "parameter": 5} # px in the SVG
+    FONT = {"class": 9, "method": 7, "parameter": 5}
+    RING_MAX = 16 # up to so many classes sit on a circle, more get a sunflower spiral
+    SCALE = 60 # px per layout unit
+
+    def __init__(self, classes_structs):
+        self.classes_structs = classes_structs
+        self.G = nx.Graph()
+        self.index = {} # class id -> {method id -> [parameter ids]}
+        self.class_check_status = {} # class id -> visible
+        self.pos = None
+        self.nodes = [] # node ids in layout order, row i of self.coords
+        self.coords = None
+        self.fig, self.ax = None, None
+        self.class_check_buttons = None
+        self.create_graph()
+        self.create_positions()
+
+    def __str__(self) -> str:
+        return f"MonitorVisualizer(classes={len(self.index)}, nodes={self.G.number_of_nodes()})"
+
+    def create_graph(self):
+        """Adds classes, methods and parameters with qualified ids and fills the adjacency index"""
+        nodes, edges = [], []
+        seen = {} # id -> how often it came up
+        for cls in self.classes_structs.get("Classes", []):
+            class_id = cls.get("qualname", cls["name"])
+            seen[class_id] = seen.get(class_id, 0) + 1
+            if seen[class_id] > 1: # same name without module info, keep both
+                class_id = f"{class_id}#{seen[class_id]}"
+            methods = self.index[class_id] = {}
+            nodes.append((class_id, {"type": "class", "label": cls["name"]}))
+            for method in cls.get("methods", []):
+                method_id = f"{class_id}.{method['name']}"
+                params = methods.setdefault(method_id, [])
+                nodes.append((method_id, {"type": "method", "label": method["name"], "class_name": class_id}))
+                edges.append((class_id, method_id))
+                for param in method.get("parameters", []):
+                    param_id = f"{method_id}:{param['name']}"
+                    params.append(param_id)
+                    nodes.append((param_id, {"type": "parameter", "label": param["name"], "method_name": method_id}))
+                    edges.append((method_id, param_id))
+        self.G.add_nodes_from(nodes)
+        self.G.add_edges_from(edges)
+        self.class_check_status = {class_id: True for class_id in self.index}
+
+    def create_positions(self):
+        """
+        Vectorized layout: classes on a circle (sunflower spiral when there are many), their methods on a circle
+        of 0.5 around the class and the parameters on a circle of 0.1 around their method
+        """
+        classes = list(self.index)
+        method_lists = [list(self.index[class_id]) for class_id in classes]
+        method_ids = [method_id for methods in method_lists for method_id in methods]
+        param_lists = [self.index[class_id][method_id] for class_id, methods in zip(classes, method_lists) for method_id in methods]
+        param_ids = [param_id for params in param_lists for param_id in params]
+
+        n = len(classes)
+        i = np.arange(n)
+        if n <= self.RING_MAX:
+            radius = max(1.0, n * 1.3 / (2 * np.pi)) # neighbours don't overlap their method circles
+            angle = 2 * np.pi * i / max(n, 1)
+            class_xy = np.column_stack((np.cos(angle), np.sin(angle))) * radius
+        else:
+            golden = np.pi * (3 - np.sqrt(5))
+            r = 0.75 * np.sqrt(i + 0.5)
+            class_xy = np.column_stack((r * np.cos(i * golden), r * np.sin(i * golden)))
+
+        method_xy = self._ring(class_xy, np.array([len(m) for m in method_lists], dtype=np.intp), 0.5)
+        param_xy = self._ring(method_xy, np.array([len(p) for p in param_lists], dtype=np.intp), 0.1)
+
+        self.nodes = classes + method_ids + param_ids
+        self.coords = np.vstack((class_xy, method_xy, param_xy)) if self.nodes else np.zeros((0, 2))
+        self.pos = dict(zip(self.nodes, map(tuple, self.coords.tolist())))
+
+    @staticmethod
+    def _ring(parent_xy, counts, radius):
+        """Places counts[k] children evenly on a circle of radius around parent_xy[k], all at once"""
+        total = int(counts.sum())
+        if total == 0:
+            return np.zeros((0, 2))
+        parent = np.repeat(np.arange(len(counts)), counts)
+        j = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts) # index inside the parent
+        angle = 2 * np.pi * j / counts[parent]
+        return parent_xy[parent] + radius * np.column_stack((np.cos(angle), np.sin(angle)))
+
+    def visible_nodes(self):
+        """Nodes of the visible classes, straight from the index"""
+        visible = []
+        for class_id, shown in self.class_check_status.items():
+            if shown:
+                visible.append(class_id)
+                for method_id, params in self.index[class_id].items():
+                    visible.append(method_id)
+                    visible.extend(params)
+        return visible
+
+    def set_visible(self, class_id, visible=True):
+        self.class_check_status[class_id] = visible
+        if self.ax is not None:
+            self.update_graph()
+
+    def to_svg(self, path=None, visible_only=True):
+        """
+        Renders the graph as static SVG, no display needed
+        Args:
+            path (str)          = file to write, None = only return the text
+            visible_only (bool) = leave out the classes switched off with set_visible
+        Returns:
+            svg (str)
+        """
+        return self._write(path, self._svg(visible_only))
+
+    def to_html(self, path=None):
+        """
+        Renders a standalone HTML page with the SVG and one checkbox per class to hide/show it in the browser
+        Args:
+            path (str)  = file to write, None = only return the text
+        Returns:
+            html (str)
+        """
+        boxes = "\n".join(
+            f'<label><input type="checkbox" checked data-group="g{i}">{html.escape(class_id)}</label><br>'
+            for i, class_id in enumerate(self.index)
+        )
+        page = (
+            "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>Class Structure Diagram</title>\n"
+            "<style>body{margin:0;display:flex;font-family:sans-serif;font-size:12px}"
+            "#classes{width:220px;height:100vh;overflow:auto;padding:8px;box-sizing:border-box}"
+            "#graph{flex:1;height:100vh;overflow:auto}</style></head><body>\n"
+            f"<div id=\"classes\">{boxes}</div>\n<div id=\"graph\">{self._svg(False)}</div>\n"
+            "<script>document.querySelectorAll('#classes input').forEach(function(box){"
+            "box.addEventListener('change',function(){document.getElementById(box.dataset.group)"
+            ".style.display=box.checked?'':'none';});});</script>\n</body></html>\n"
+        )
+        return self._write(path, page)
+
+    def save(self, path):
+        """Writes .svg or .html (chosen by the extension)"""
+        if path.endswith((".html", ".htm")):
+            return self.to_html(path)
+        return self.to_svg(path)
+
+    @staticmethod
+    def _write(path, text):
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        return text
+
+    def _svg(self, visible_only):
+        """SVG with one <g id="g<i>"> per class, so the HTML page can toggle them"""
+        if not self.nodes:
+            return '<svg xmlns="http://www.w3.org/2000/svg" width="100" height="100"></svg>'
+        margin = 2 * self.RADIUS["class"]
+        low = self.coords.min(axis=0)
+        px = (self.coords - low) * self.SCALE + margin
+        px[:, 1] = px[:, 1].max() + margin - px[:, 1] # svg y points down
+        width, height = px.max(axis=0) + margin
+        row = {node: k for k, node in enumerate(self.nodes)}
+        parts = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}" height="{height:.0f}" '
+            f'viewBox="0 0 {width:.0f} {height:.0f}" font-family="sans-serif" text-anchor="middle">',
+            '<text x="10" y="20" text-anchor="start" font-size="14">Class Structure Diagram</text>',
+        ]
+        for i, (class_id, methods) in enumerate(self.index.items()):
+            if visible_only and not self.class_check_status.get(class_id, True):
+                continue
+            members = [class_id]
+            lines = []
+            for method_id, params in methods.items():
+                members.append(method_id)
+                members.extend(params)
+                lines.append((class_id, method_id))
+                lines.extend((method_id, param_id) for param_id in params)
+            parts.append(f'<g id="g{i}">')
+            parts.extend(
+                f'<line x1="{px[row[a], 0]:.1f}" y1="{px[row[a], 1]:.1f}" x2="{px[row[b], 0]:.1f}" y2="{px[row[b], 1]:.1f}" stroke="gray" stroke-width="0.5"/>'
+                for a, b in lines
+            )
+            for node in members:
+                data = self.G.nodes[node]
+                kind = data["type"]
+                x, y = px[row[node]]
+                parts.append(
+                    f'<circle cx="{x:.1f}" cy="{y:.1f}" r="{self.RADIUS[kind]}" fill="{self.COLORS[kind]}"><title>{html.escape(node)}</title></circle>'
+                    f'<text x="{x:.1f}" y="{y + self.FONT[kind] / 3:.1f}" font-size="{self.FONT[kind]}">{html.escape(data["label"])}</text>'
+                )
+            parts.append("</g>")
+        parts.append("</svg>")
+        return "\n".join(parts)
+
+    def draw_graph(self):
+        """Draws into an interactive matplotlib window with one check button per class (needs a display)"""
+        import matplotlib.pyplot as plt
+        self.fig, self.ax = plt.subplots(figsize=(12, 10))
+        self.add_check_buttons()
+        self.update_graph()
+        plt.show()
+
+    def add_check_buttons(self):
+        """Create check buttons for each class to toggle visibility"""
+        from matplotlib.widgets import CheckButtons
+        classes = list(self.index)
+        ax_check = self.fig.add_axes([0.01, 0.2, 0.1, 0.6])
+        self.class_check_buttons = CheckButtons(ax_check, classes, [self.class_check_status[c] for c in classes])
+
+        def toggle_class(label):
+            if label in self.class_check_status:
+                self.set_visible(label, not self.class_check_status[label])
+
+        self.class_check_buttons.on_clicked(toggle_class)
+
+    def update_graph(self):
+        """Clear the axis and redraw the visible classes, their nodes come from the index instead of a graph scan"""
+        import matplotlib.pyplot as plt
+        self.ax.clear()
+        self.ax.set_title("Class Structure Diagram")
+        G_visible = self.G.subgraph(self.visible_nodes())
+        node_color = [self.COLORS[data["type"]] for _, data in G_visible.nodes(data=True)]
+        nx.draw(
+            G_visible,
+            self.pos,
+            labels={node: data["label"] for node, data in G_visible.nodes(data=True)},
+            node_size=1500,
+            node_color=node_color,
+            font_size=7,
+            ax=self.ax,
+            node_shape="o",
+            edge_color="gray",
+        )
+        plt.draw()
+
+    def main(self, path=None):
+        """Exports to path (.svg/.html) when given or when there is no display, else opens the window"""
+        if path is None and not os.environ.get("DISPLAY") and os.name != "nt":
+            path = "UML.html"
+        if path is not None:
+            return self.save(path)
+        self.draw_graph()
@@ -0,0 +1,98 @@
+import json
+import os
+import time
+
+import pytest
+
+import pysu
+from pysu import FunctionProfiler, TraceAnalyzer, compare_traces
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run(tmp_path, delay=0.0):
+    """Traces A.run and B.run into TRACE.jsonl and TRACE.pysutrace in tmp_path"""
+    profiler = FunctionProfiler(True, binary=str(tmp_path / "TRACE.pysutrace"))
+    profiler.sink.path = str(tmp_path / "TRACE.jsonl")
+
+    class A:
+        @profiler.trace
+        def run(self, n):
+            time.sleep(delay)
+            return n
+
+    class B:
+        @profiler.trace
+        def run(self, n):
+            if n == 3:
+                raise ValueError(n)
+            return n
+
+    for n in range(20):
+        A().run(n)
+        try:
+            B().run(n)
+        except ValueError:
+            pass
+    profiler.close()
+    profiler.sink.close()
+    profiler.binary.close()
+    return A.run.__qualname__.rsplit(".", 2)[0]
+
+
+def test_jsonl_and_binary_agree(tmp_path):
+    owner = _run(tmp_path)
+    jsonl = TraceAnalyzer(top=3).add(str(tmp_path / "TRACE.jsonl")).stats()
+    binary = TraceAnalyzer(top=3).add(str(tmp_path / "TRACE.pysutrace")).stats()
+    names = {f"{__name__}.{owner}.A.run", f"{__name__}.{owner}.B.run"}
+    assert set(jsonl) == set(binary) == names
+    for name in names:
+        assert jsonl[name]["count"] == binary[name]["count"] == 20
+        assert len(jsonl[name]["top"]) == 3
+    assert jsonl[f"{__name__}.{owner}.B.run"]["errors"] == binary[f"{__name__}.{owner}.B.run"]["errors"] == 1
+    stats = jsonl[f"{__name__}.{owner}.A.run"]
+    assert stats["min"] <= stats["p50"] <= stats["p99"] <= stats["max"]
+    assert stats["top"][0]["duration_ns"] == stats["max"]
+    assert "startzeit" in stats["top"][0]["record"]
+
+
+def test_top_records_open_each_file_once(tmp_path, monkeypatch):
+    _run(tmp_path)
+    analyzer = TraceAnalyzer(top=10).add(str(tmp_path / "TRACE.pysutrace"))
+    opened = []
+    original = pysu.TraceReader.__init__
+    monkeypatch.setattr(pysu.TraceReader, "__init__", lambda self, path: (opened.append(path), original(self, path))[1])
+    analyzer.stats()
+    assert len(opened) == 1
+
+
+def test_legacy_trace_json():
+    stats = TraceAnalyzer().add(os.path.join(REPO, "TRACE.json")).stats()
+    assert stats["example_function2"]["count"] == 1
+    assert stats["example_function2"]["max"] == round(0.5003597736358643 * 1e9)
+
+
+def test_compare_flags_regressions(tmp_path):
+    (tmp_path / "old").mkdir()
+    (tmp_path / "new").mkdir()
+    _run(tmp_path / "old")
+    _run(tmp_path / "new", delay=0.002)
+    old = TraceAnalyzer().add(str(tmp_path / "old")).report()
+    new = TraceAnalyzer().add(str(tmp_path / "new")).report()
+    result = compare_traces(old, new, threshold=0.5, metrics=("p50",))
+    assert ["A", "run"] in [change["name"].rsplit(".", 2)[-2:] for change in result["regressions"]]
+    assert compare_traces(old, old)["regressions"] == []
+
+
+def test_cli_exit_codes(tmp_path, capsys):
+    (tmp_path / "old").mkdir()
+    (tmp_path / "new").mkdir()
+    _run(tmp_path / "old")
+    _run(tmp_path / "new", delay=0.002)
+    assert pysu.main(["analyze", str(tmp_path / "old"), "--output", str(tmp_path / "old.json")]) == 0
+    assert json.loads(capsys.readouterr().out)["meta"]["records"] == 40
+    assert pysu.main(["compare", str(tmp_path / "old.json"), str(tmp_path / "new"), "--threshold", "0.5"]) == 1
+    capsys.readouterr()
+    (tmp_path / "broken.json").write_text("[1,")
+    assert pysu.main(["analyze", str(tmp_path / "broken.json")]) == 2
+    assert "broken.json" in capsys.readouterr().err
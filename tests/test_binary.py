@@ -0,0 +1,34 @@
+import gc
+import warnings
+
+import pytest
+
+from pysu import BinaryTraceSink, TraceReader
+
+
+@pytest.mark.filterwarnings("error::pytest.PytestUnraisableExceptionWarning") # a ResourceWarning in __del__
+def test_round_trip_and_append(tmp_path):
+    path = str(tmp_path / "TRACE.pysutrace")
+    sink = BinaryTraceSink(path)
+    for i in range(100):
+        sink.add("mod.f" if i % 2 else "mod.g", 1_000 + i, 10 * i, i % 10 == 0)
+    sink.close()
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", ResourceWarning)
+        sink = BinaryTraceSink(path) # reopening keeps the ids of the existing strings
+        sink.add("mod.f", 5_000, 7, False)
+        sink.add("mod.h", 5_001, 8, True)
+        sink.close()
+        gc.collect()
+
+    reader = TraceReader(path)
+    assert len(reader) == 102
+    assert reader.names == ["mod.g", "mod.f", "mod.h"]
+    stats = reader.aggregate()
+    assert stats["mod.f"]["count"] == 51 and stats["mod.g"]["count"] == 50 and stats["mod.h"]["count"] == 1
+    assert stats["mod.g"]["errors"] == 10 and stats["mod.h"]["errors"] == 1
+    assert stats["mod.f"]["max_ns"] == 990
+    slow = reader.select(func="mod.f", min_duration_ns=900)
+    assert sorted(slow["duration_ns"].tolist()) == [910, 930, 950, 970, 990]
+    assert reader.select(raised=True, func=["mod.h"])["start_ns"].tolist() == [5_001]
@@ -0,0 +1,68 @@
+from pysu import ProjectScanner
+
+FILES = {
+    "pkg/__init__.py": "from .engine import Engine\n",
+    "pkg/engine.py": (
+        "import os\n"
+        "\n"
+        "class Base:\n"
+        "    def start(self):\n"
+        "        self.helper()\n"
+        "\n"
+        "    def helper(self):\n"
+        "        return os.path.join('a', 'b')\n"
+        "\n"
+        "class Engine(Base):\n"
+        "    def __init__(self):\n"
+        "        super().__init__()\n"
+        "\n"
+        "    def run(self):\n"
+        "        self.start()\n"
+        "        return len('x')\n"
+    ),
+    "pkg/app.py": (
+        "from pkg import Engine\n"
+        "from . import engine\n"
+        "\n"
+        "def main():\n"
+        "    e = Engine()\n"
+        "    e.run()\n"
+        "    engine.Engine().start()\n"
+        "    helper()\n"
+        "\n"
+        "def helper():\n"
+        "    pass\n"
+    ),
+}
+
+
+def _graph(tmp_path):
+    for name, text in FILES.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+    scanner = ProjectScanner(str(tmp_path), workers=1)
+    scanner.run()
+    return scanner.call_graph()
+
+
+def test_resolution(tmp_path):
+    graph = _graph(tmp_path)
+    assert graph.callees("pkg.app.main") == [
+        "pkg.app.helper", # local definition
+        "pkg.engine.Base.start", # module import, inherited method
+        "pkg.engine.Engine.__init__", # re-export of the package, constructor
+        "pkg.engine.Engine.run", # receiver typed by the assignment
+    ]
+    assert graph.callees("pkg.engine.Engine.run") == ["pkg.engine.Base.start"] # self. along the bases
+    assert graph.callees("pkg.engine.Base.helper") == ["os.path.join"]
+    assert "os.path.join" in graph.external
+    assert graph.unresolved["pkg.engine.Engine.run"] == ["len"]
+
+
+def test_walks(tmp_path):
+    graph = _graph(tmp_path)
+    assert graph.callers("pkg.engine.Base.start") == ["pkg.app.main", "pkg.engine.Engine.run"]
+    assert "pkg.engine.Base.helper" in graph.reachable_from("pkg.app.main")
+    assert graph.reachable_from("pkg.app.main", max_depth=1) == graph.callees("pkg.app.main")
+    assert graph.reaching("pkg.engine.Base.helper") == ["pkg.app.main", "pkg.engine.Base.start", "pkg.engine.Engine.run"]
@@ -0,0 +1,51 @@
+import multiprocessing
+import sys
+
+import pytest
+
+from pysu import FunctionProfiler, TraceCollector
+
+profiler = FunctionProfiler(False)
+
+
+class A:
+    @profiler.trace
+    def run(self, n):
+        return n + 1
+
+
+class B:
+    @profiler.trace
+    def run(self, n):
+        return n * 2
+
+
+def teardown_module():
+    profiler.close()
+
+
+def job(n):
+    return A().run(n) + B().run(n)
+
+
+def _records(name, n):
+    return [{"kind": "trace", "pid": 1, "record": {"funktion": "run", "name": name, "dauer": 0.001 * i}} for i in range(n)]
+
+
+def test_histograms_keyed_by_qualified_name():
+    collector = TraceCollector()
+    for envelope in _records("mod.A.run", 3) + _records("mod.B.run", 2):
+        collector.ingest(envelope)
+    assert {name: summary["count"] for name, summary in collector.latency().items()} == {"mod.A.run": 3, "mod.B.run": 2}
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs fork")
+def test_workers_report_to_collector():
+    with TraceCollector() as collector:
+        with multiprocessing.get_context("fork").Pool(2) as pool:
+            assert pool.map(job, range(10)) == [3 * n + 1 for n in range(10)]
+            pool.close()
+            pool.join()
+    counts = {name: summary["count"] for name, summary in collector.latency().items()}
+    assert counts == {f"{__name__}.A.run": 10, f"{__name__}.B.run": 10}
+    assert sum(stats["traces"] for stats in collector.stats().values()) == 20
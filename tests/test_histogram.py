@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+import threading
+
+from pysu import LatencyHistogram
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_tracing_does_not_import_numpy():
+    code = (
+        "import sys\n"
+        "from pysu import FunctionProfiler\n"
+        "profiler = FunctionProfiler(False)\n"
+        "f = profiler.trace(lambda x: x + 1)\n"
+        "f(1)\n"
+        "print('numpy' in sys.modules)\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=REPO, check=True).stdout
+    assert out.strip() == "False"
+
+
+def test_percentiles_and_merge():
+    first, second = LatencyHistogram(), LatencyHistogram()
+    for ns in range(1_000, 1_001_000, 1_000): # 1us .. 1ms, uniform
+        (first if ns % 2_000 else second).record(ns)
+    merged = first.copy().merge(second)
+    summary = merged.summary()
+    assert summary["count"] == 1_000 and summary["min"] == 1_000 and summary["max"] == 1_000_000
+    for name, expected in (("p50", 500_000), ("p99", 990_000)):
+        assert abs(summary[name] - expected) / expected < 0.03
+    snapshot = merged.snapshot(reset=True)
+    assert snapshot.count == 1_000 and merged.count == 0 and merged.percentiles()["p50"] is None
+
+
+def test_snapshot_reset_loses_nothing():
+    histogram = LatencyHistogram()
+    done = threading.Event()
+
+    def work():
+        for _ in range(50_000):
+            histogram.record(5_000)
+        done.set()
+
+    thread = threading.Thread(target=work)
+    thread.start()
+    intervals = []
+    while not done.is_set():
+        intervals.append(histogram.snapshot(reset=True))
+    thread.join()
+    intervals.append(histogram.snapshot(reset=True))
+    assert sum(interval.count for interval in intervals) == 50_000
+    assert sum(sum(interval.counts) for interval in intervals) == 50_000
@@ -0,0 +1,33 @@
+import io
+import json
+import logging
+
+from pysu import pysu, ConsoleLogSink, FileLogSink, JsonlLogSink
+
+
+def test_console_output_without_console_sink(tmp_path, capsys):
+    log = pysu(level=1, linked=False, save=False, scan_cache=False, sinks=[FileLogSink(str(tmp_path / "LOG.txt"))])
+    log.error("visible") # console=True by default
+    log.close()
+    assert "visible" in capsys.readouterr().err
+    assert "visible" in (tmp_path / "LOG.txt").read_text()
+
+
+def test_stdlib_logging_reaches_all_sinks(tmp_path):
+    out = io.StringIO()
+    log = pysu(level=2, linked=False, save=False, scan_cache=False,
+               sinks=[ConsoleLogSink(out, level=1), JsonlLogSink(str(tmp_path / "LOG.jsonl"))])
+    logger = logging.getLogger("pysu-test")
+    logger.propagate = False
+    logger.addHandler(log.handler())
+    try:
+        logger.warning("careful %s", 1)
+        logger.error("broken")
+        logger.info("dropped by the pysu level")
+    finally:
+        logger.handlers.clear()
+    log.close()
+    records = [json.loads(line) for line in (tmp_path / "LOG.jsonl").read_text().splitlines()]
+    assert [(r["level"], r["msg"], r["logger"]) for r in records] == [("WARNING", "careful 1", "pysu-test"), ("ERROR", "broken", "pysu-test")]
+    assert "broken" in out.getvalue() and "careful" not in out.getvalue()
+    assert [m["msg"] for m in log.messages] == ["careful 1", "broken"]
@@ -0,0 +1,38 @@
+import contextvars
+import tracemalloc
+
+from pysu import FunctionProfiler, MemoryTracker
+
+BLOCK = 4_000_000
+
+
+def test_concurrent_region_keeps_the_peak():
+    tracker = MemoryTracker(top=0)
+    outer = tracker.begin("outer", __file__)
+    block = bytearray(BLOCK)
+    del block
+    other = contextvars.Context() # a call of another thread/task, not nested in outer
+    state = other.run(tracker.begin, "other", __file__)
+    other.run(tracker.end, "other", state)
+    assert tracker.end("outer", outer)["peak_bytes"] >= BLOCK
+    assert not tracemalloc.is_tracing()
+
+
+def test_nested_calls():
+    profiler = FunctionProfiler(False, "settrace", memory={"top": 0})
+
+    @profiler.trace
+    def inner():
+        return len(bytearray(BLOCK))
+
+    @profiler.trace
+    def outer():
+        block = bytearray(BLOCK)
+        del block
+        return inner()
+
+    outer()
+    profiler.close()
+    inner_record, outer_record = profiler.logs
+    assert inner_record["speicher"]["peak_bytes"] >= BLOCK
+    assert outer_record["speicher"]["peak_bytes"] >= BLOCK and abs(outer_record["speicher"]["net_bytes"]) < BLOCK
@@ -0,0 +1,20 @@
+from pysu import ArgRenderer, _safe_repr
+
+
+def test_plain_values_use_repr():
+    for value in (1, -2**63, 1.5, True, None, "text"):
+        assert _safe_repr(value) == repr(value)
+
+
+def test_big_values_stay_bounded():
+    assert len(_safe_repr(10**5000)) <= 200 # repr would raise above 4300 digits
+    assert len(_safe_repr("x" * 10_000)) <= 200
+    assert len(_safe_repr(list(range(10_000)))) <= 200
+    assert _safe_repr(bytearray(10**6)).startswith("bytearray(")
+
+
+def test_broken_repr_never_raises():
+    class Broken:
+        def __repr__(self):
+            raise RuntimeError("no")
+    assert "Broken" in ArgRenderer().render(Broken())
@@ -0,0 +1,26 @@
+import threading
+import time
+
+from pysu import SamplingProfiler
+
+
+def _busy(stop):
+    funcs = [eval(f"lambda f, n: f(f, n - 1) if n else sum(range({i}))") for i in range(200)] # many distinct code objects
+    while not stop.is_set():
+        for func in funcs:
+            func(func, 5)
+
+
+def test_report_while_sampling():
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy, args=(stop,))
+    worker.start()
+    try:
+        with SamplingProfiler(rate=2000, top=5) as sampler:
+            deadline = time.perf_counter() + 0.5
+            while time.perf_counter() < deadline:
+                report = sampler.report()
+        assert sampler.samples > 0 and len(report["functions"]) <= 5
+    finally:
+        stop.set()
+        worker.join()
@@ -0,0 +1,19 @@
+from pysu import ProjectScanner, ProjectWatcher
+
+
+def _project(tmp_path):
+    (tmp_path / "a.py").write_text("class A:\n    def run(self):\n        self.start()\n    def start(self):\n        pass\n")
+    (tmp_path / "b.py").write_text("class B:\n    def run(self):\n        self.stop()\n    def stop(self):\n        pass\n")
+
+
+def test_same_method_name_in_two_modules(tmp_path):
+    _project(tmp_path)
+    structs = ProjectScanner(str(tmp_path), workers=1, cache=None).run()
+    calls = {call["qualname"]: [callee["name"] for callee in call["callees"]] for call in structs["CallHierarchy"]}
+    assert calls == {"a.run": ["start"], "b.run": ["stop"]}
+    assert {call["name"] for call in structs["CallHierarchy"]} == {"run"}
+    assert sorted(cls["qualname"] for cls in structs["Classes"]) == ["a.A", "b.B"]
+
+    watcher = ProjectWatcher(str(tmp_path), workers=1)
+    watcher.poll()
+    assert {call["qualname"]: [callee["name"] for callee in call["callees"]] for call in watcher.structs["CallHierarchy"]} == calls
@@ -0,0 +1,94 @@
+import threading
+
+from pysu import pysu, BoundedStore, MessageStore
+
+THREADS = 4
+CALLS = 20_000
+
+
+def _hammer(target):
+    threads = [threading.Thread(target=target, args=(t,)) for t in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_message_store_threads_keep_pairs_and_counters():
+    store = MessageStore(max_entries=100)
+
+    def work(t):
+        for i in range(CALLS):
+            store.add(3, f"{t}-{i}", t * CALLS + i)
+
+    _hammer(work)
+    assert len(store) + store.stats()["dropped"][3] == THREADS * CALLS
+    for message in store:
+        t, i = map(int, message["msg"].split("-"))
+        assert message["ts"] == t * CALLS + i
+
+
+def test_message_store_threads_unbounded():
+    store = MessageStore()
+
+    def work(t):
+        for i in range(CALLS):
+            store.add(1, f"{t}-{i}", t * CALLS + i)
+
+    _hammer(work)
+    messages = store.get_level(1)
+    assert len(messages) == THREADS * CALLS
+    assert all(m["ts"] == int(m["msg"].split("-")[0]) * CALLS + int(m["msg"].split("-")[1]) for m in messages)
+
+
+def test_pysu_log_from_threads():
+    log = pysu(level=2, linked=False, save=False, scan_cache=False, retention={"max_entries": 100})
+
+    def work(t):
+        for i in range(CALLS):
+            log.warn(f"{t}-{i}")
+
+    _hammer(work)
+    log.close()
+    assert len(log.messages) + log.messages.stats()["dropped"][2] == THREADS * CALLS
+
+
+def test_eviction_policies():
+    store = BoundedStore("trace", lambda record: record["mID"], max_entries={1: 2, 3: 3})
+    for i in range(10):
+        store.append({"mID": 1 if i % 2 else 3, "i": i})
+    assert [r["i"] for r in store.get_level(1)] == [7, 9]
+    assert [r["i"] for r in store.get_level(3)] == [4, 6, 8]
+    assert [r["i"] for r in store] == [4, 6, 7, 8, 9] # insertion order over the levels
+    assert store.stats()["dropped"] == {1: 3, 3: 2}
+
+    keep_errors = BoundedStore("trace", lambda record: record["mID"], max_bytes=1, policy="keep_errors")
+    keep_errors.append({"mID": 1, "i": 0})
+    keep_errors.append({"mID": 3, "i": 1})
+    assert keep_errors.stats()["dropped"].get(3) == 1
+
+
+def test_spill(tmp_path):
+    store = MessageStore(max_entries=1, spill=str(tmp_path))
+    store.add(2, "a", 1.0)
+    store.add(2, "b", 2.0)
+    store.close()
+    assert store.get_last(2, 5) == [{"mID": 2, "msg": "b", "ts": 2.0}]
+    assert (tmp_path / "messages.spill.jsonl").read_text().count("\n") == 1
+    assert store.stats()["spilled"] == {2: 1}
+
+
+def test_stamped_messages_stay_time_ordered():
+    store = MessageStore()
+
+    def work(t):
+        for i in range(CALLS // 4):
+            store.add(2, f"{t}-{i}")
+
+    _hammer(work)
+    messages = store.get_level(2)
+    stamps = [m["ts"] for m in messages]
+    assert stamps == sorted(stamps) and len(stamps) == THREADS * CALLS // 4
+    t0, t1 = stamps[len(stamps) // 3], stamps[2 * len(stamps) // 3]
+    assert store.get_between(2, t0, t1) == [m for m in messages if t0 <= m["ts"] <= t1]
+    assert store.get_last(2, 5) == messages[-5:]
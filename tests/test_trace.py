@@ -0,0 +1,232 @@
+import asyncio
+import sys
+import threading
+import warnings
+
+import pytest
+
+import pysu
+from pysu import FunctionProfiler
+
+ENGINES = ["settrace"] + (["monitoring"] if hasattr(sys, "monitoring") else [])
+
+
+@pytest.fixture(params=ENGINES)
+def profiler(request):
+    profiler = FunctionProfiler(False, request.param)
+    yield profiler
+    profiler.close()
+
+
+def _events(record, kind):
+    return [event for event in record["vtrace"] if event[0] == kind]
+
+
+def test_record(profiler):
+    @profiler.trace
+    def add(x, y=1):
+        z = x + y
+        return z * 2
+
+    assert add(2, y=3) == 10
+    (record,) = profiler.logs
+    assert record["name"] == f"{__name__}.test_record.<locals>.add"
+    assert record["ergebnis"] == "10" and record["args"] == "2" and record["kwargs"] == {"y": "3"}
+    assert ("z", "5") in [delta for event in _events(record, "line") for delta in event[3]]
+    assert _events(record, "return")[-1][3] == "10"
+    assert record["dauer"] >= 0 and record["thread_cpu_dauer"] >= 0
+    assert profiler.latency()[record["name"]]["count"] == 1
+
+
+def test_exception(profiler):
+    @profiler.trace
+    def fail():
+        raise ValueError("no")
+
+    with pytest.raises(ValueError):
+        fail()
+    (record,) = profiler.logs
+    assert record["fehler"] == "ValueError: no" and "Traceback" in record["traceback"]
+
+
+def test_nested(profiler):
+    @profiler.trace
+    def inner(x):
+        return x * 2
+
+    @profiler.trace
+    def outer(x):
+        y = inner(x)
+        return y + 1
+
+    assert outer(2) == 5
+    assert [record["funktion"] for record in profiler.logs] == ["inner", "outer"]
+    outer_record = list(profiler.logs)[1]
+    assert [event[2] for event in _events(outer_record, "call")] == [outer_record["name"]]
+    (tree,) = profiler.call_tree().values()
+    assert tree["name"].endswith("outer") and [child["name"].split(".")[-1] for child in tree["children"]] == ["inner"]
+    assert tree["inclusive_ns"] >= tree["children"][0]["inclusive_ns"]
+
+
+def test_async(profiler):
+    @profiler.trace
+    async def job(name, delay):
+        value = name * 2
+        await asyncio.sleep(delay)
+        return value
+
+    async def main():
+        return await asyncio.gather(job("a", 0.02), job("b", 0.01))
+
+    assert asyncio.run(main()) == ["aa", "bb"]
+    records = {record["ergebnis"]: record for record in profiler.logs}
+    assert set(records) == {"'aa'", "'bb'"}
+    for result, record in records.items():
+        deltas = [delta for event in _events(record, "line") for delta in event[3]]
+        assert ("value", result) in deltas and len({value for name, value in deltas if name == "value"}) == 1
+        assert record["await_dauer"] > 0.005 and record["cpu_dauer"] < record["dauer"]
+
+
+def test_threads(profiler):
+    @profiler.trace
+    def square(x):
+        y = x * x
+        return y
+
+    def work(offset):
+        for i in range(200):
+            assert square(offset + i) == (offset + i) ** 2
+
+    threads = [threading.Thread(target=work, args=(t * 1000,)) for t in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    records = list(profiler.logs)
+    assert len(records) == 800
+    for record in records:
+        assert int(record["ergebnis"]) == int(record["args"]) ** 2
+        assert ("y", record["ergebnis"]) in [delta for event in _events(record, "line") for delta in event[3]]
+    assert sum(summary["count"] for summary in profiler.latency().values()) == 800
+
+
+def test_switch(profiler):
+    @profiler.trace
+    def f(x):
+        return x
+
+    profiler.disable()
+    f(1)
+    profiler.enable()
+    f(2)
+    profiler.disable(f"{__name__}.*")
+    f(3)
+    assert [record["args"] for record in profiler.logs] == ["2"]
+
+
+def _helper(x):
+    doubled = x * 2
+    return doubled
+
+
+def _failing(x):
+    raise KeyError(x)
+
+
+def test_callees(profiler):
+    @profiler.trace
+    def entry(x):
+        total = _helper(x)
+        try:
+            _failing(x)
+        except KeyError:
+            total += 1
+        return total
+
+    assert entry(3) == 7
+    (record,) = profiler.logs
+    helper, failing = f"{__name__}._helper", f"{__name__}._failing"
+    assert [event[2] for event in _events(record, "call")] == [record["name"], helper, failing]
+    assert [event[2] for event in _events(record, "return")] == [helper, failing, record["name"]]
+    assert ("doubled", "6") in [delta for event in _events(record, "line") for delta in event[3]]
+    (tree,) = profiler.call_tree().values()
+    assert {child["name"] for child in tree["children"]} == {helper, failing}
+
+
+@pytest.mark.skipif(not hasattr(sys, "monitoring"), reason="needs sys.monitoring")
+def test_monitoring_tool_is_shared():
+    users = pysu._MonitoringTool._shared.users if pysu._MonitoringTool._shared else 0
+    with warnings.catch_warnings():
+        warnings.simplefilter("error") # no fallback to settrace
+        profilers = [FunctionProfiler(False, "monitoring") for _ in range(5)]
+    assert len({profiler.engine.tool.tool_id for profiler in profilers}) == 1
+    tool_id = profilers[0].engine.tool.tool_id
+    for profiler in profilers:
+        profiler.close()
+    if users:
+        assert pysu._MonitoringTool._shared.users == users
+    else:
+        assert sys.monitoring.get_tool(tool_id) is None
+
+
+def test_in_place_mutation(profiler):
+    @profiler.trace
+    def grow():
+        b = [1, 2]
+        b.append(3)
+        d = {}
+        d["k"] = b
+        return len(b)
+
+    grow()
+    (record,) = profiler.logs
+    deltas = [delta for event in _events(record, "line") for delta in event[3]]
+    assert ("b", "[1, 2, 3]") in deltas and ("d", "{'k': [1, 2, 3]}") in deltas
+    assert [name for name, _ in deltas].count("b") == 2 # unchanged lines don't repeat it
+
+
+class _A:
+    def run(self):
+        return 1
+
+
+class _B:
+    def run(self):
+        return 2
+
+
+def test_call_tree_keeps_methods_apart(profiler):
+    @profiler.trace
+    def entry():
+        return _A().run() + _B().run()
+
+    entry()
+    (tree,) = profiler.call_tree().values()
+    assert sorted(child["name"] for child in tree["children"]) == [f"{__name__}._A.run", f"{__name__}._B.run"]
+    assert {line.rsplit(" ", 1)[0].split(";")[-1] for line in profiler.folded_stacks().splitlines()} >= {f"{__name__}._A.run", f"{__name__}._B.run"}
+
+
+def test_scopes(profiler, tmp_path):
+    import textwrap
+
+    def body():
+        a = 1
+        b = textwrap.dedent("  x")
+        c = _helper(a)
+        return b, c
+
+    first = body.__code__.co_firstlineno
+    by_module = profiler.trace(modules=[__name__])(body)
+    by_path = profiler.trace(paths=[str(tmp_path)])(body)
+    by_lines = profiler.trace(modules=[__name__], lines=(first + 3, first + 3))(body) # ranges apply to this file only
+    by_watch = profiler.trace(watch=["c"])(body)
+    for traced in (by_module, by_path, by_lines, by_watch):
+        traced()
+    module, path, lines, watch = profiler.logs
+    helper, dedent = f"{__name__}._helper", "textwrap.dedent"
+
+    called = [event[2] for event in _events(module, "call")]
+    assert helper in called and dedent not in called
+    assert [event[2] for event in _events(path, "call")] == [path["name"]] # only the decorated function itself
+    assert [event[2] for event in _events(lines, "line")] == [first + 3] and helper in [event[2] for event in _events(lines, "call")]
+    assert {name for event in _events(watch, "line") for name, _ in event[3]} == {"c"}
@@ -0,0 +1,47 @@
+import os
+
+from pysu import ProjectWatcher
+
+
+def _write(path, text, mtime_ns):
+    path.write_text(text)
+    os.utime(path, ns=(mtime_ns, mtime_ns)) # mtime resolution of the file system doesn't matter
+
+
+def test_change_detection(tmp_path):
+    good = tmp_path / "good.py"
+    broken = tmp_path / "broken.py"
+    _write(good, "class Good:\n    def run(self, x):\n        return x\n", 1_000_000_000)
+    _write(broken, "class Broken(:\n", 1_000_000_000)
+    watcher = ProjectWatcher(str(tmp_path), workers=1, uml_path=str(tmp_path / "UML.txt"))
+
+    assert sorted(watcher.poll()) == sorted([str(good), str(broken)])
+    assert [cls["name"] for cls in watcher.structs["Classes"]] == ["Good"]
+    assert str(broken) in watcher.errors and str(broken) in watcher.failed
+
+    os.remove(tmp_path / "UML.txt")
+    assert watcher.poll() == [] # the broken file is not parsed again
+    assert not (tmp_path / "UML.txt").exists() # nothing got rebuilt
+
+    _write(broken, "class Broken:\n    def go(self):\n        Good().run(1)\n", 2_000_000_000)
+    _write(good, "class Good:\n    def run(self, x, y):\n        return x\n", 2_000_000_000)
+    assert sorted(watcher.poll()) == sorted([str(good), str(broken)])
+    assert sorted(cls["name"] for cls in watcher.structs["Classes"]) == ["Broken", "Good"]
+    assert not watcher.failed and not watcher.errors
+    good_cls = next(cls for cls in watcher.structs["Classes"] if cls["name"] == "Good")
+    assert [p["name"] for p in good_cls["methods"][0]["parameters"]] == ["self", "x", "y"]
+
+    os.remove(good)
+    assert watcher.poll() == [str(good)]
+    assert [cls["name"] for cls in watcher.structs["Classes"]] == ["Broken"]
+    assert "Good" not in (tmp_path / "UML.txt").read_text()
+
+
+def test_removed_broken_file(tmp_path):
+    broken = tmp_path / "broken.py"
+    _write(broken, "def (:\n", 1_000_000_000)
+    watcher = ProjectWatcher(str(tmp_path), workers=1)
+    watcher.poll()
+    os.remove(broken)
+    assert watcher.poll() == [str(broken)]
+    assert not watcher.failed and not watcher.errors